@@ -0,0 +1,270 @@
+"""Reproducible benchmark for the FAISS RAG build and query paths.
+
+For each corpus size (or a local PDF) it measures:
+    - embedding throughput of encode_sentences
+    - train / add time, index size and RSS growth per index type
+    - index.search QPS at several query batch sizes
+    - recall@k of every index type against exact (Flat) search
+    - end-to-end batch_rag_retrieve QPS (query encoding + search)
+
+Synthetic corpora are generated from a fixed seed, so runs are comparable
+across versions of the example. Embedding a million sentences on CPU takes
+hours; beyond --embed-limit sentences the corpus vectors are resampled from
+the embedded ones with small seeded noise (recorded as "vectors": "resampled"
+in the output), which keeps index timings and recall meaningful.
+
+Usage:
+    python benchmark.py --sizes 1000 10000 100000 --output results.json
+    python benchmark.py --pdf document.pdf --index-types Flat "HNSW32:efSearch=64"
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from typing import List, Optional, Tuple
+
+import numpy as np
+import faiss
+from sentence_transformers import SentenceTransformer
+
+from profiling import current_rss_bytes
+from utils import (_faiss_index_size_bytes, _recall_at_k, batch_rag_retrieve, encode_sentences,
+                   extract_text_from_pdf, split_text_into_sentences)
+
+
+# "{nlist}" and "{pq_m}" are filled in per corpus size
+DEFAULT_INDEX_TYPES = (
+    "Flat",
+    "HNSW32:efSearch=64",
+    "IVF{nlist},Flat:nprobe=16",
+    "IVF{nlist},SQ8:nprobe=16",
+    "IVF{nlist},PQ{pq_m}x8np:nprobe=16",
+)
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_BATCH_SIZES = (1, 16, 256)
+
+_SUBJECTS = ("The pump", "The controller", "Each sensor", "The operator", "The valve", "A technician",
+             "The firmware", "The safety relay", "The cooling loop", "The inspection report")
+_VERBS = ("must be checked", "reports", "is replaced", "should be calibrated", "shuts down",
+          "records", "is rated", "triggers", "limits", "is monitored")
+_OBJECTS = ("the inlet pressure", "error code E-{n}", "the torque setting", "the maintenance interval",
+            "the flow rate", "the temperature threshold", "part number P{n}", "the warranty terms",
+            "the backup battery", "the alarm log")
+_QUALIFIERS = ("every {n} hours", "before each shift", "when the load exceeds {n} percent",
+               "according to section {n}", "after a power failure", "during cold starts",
+               "unless the override is enabled", "within {n} days of installation")
+
+
+def synthetic_sentences(count: int, seed: int = 42) -> List[str]:
+    """Deterministic manual-style sentences with numbers and codes, similar to PDF text."""
+    rng = np.random.default_rng(seed)
+    parts = [rng.integers(0, len(options), size=count) for options in (_SUBJECTS, _VERBS, _OBJECTS, _QUALIFIERS)]
+    numbers = rng.integers(1, 1000, size=(count, 2))
+    return [
+        f"{_SUBJECTS[s]} {_VERBS[v]} {_OBJECTS[o].format(n=a)} {_QUALIFIERS[q].format(n=b)}."
+        for s, v, o, q, (a, b) in zip(*parts, numbers)
+    ]
+
+
+def parse_index_type(spec: str) -> Tuple[str, dict]:
+    """Split "factory:param=value,..." into the factory string and its search parameters."""
+    factory, _, params = spec.partition(":")
+    search_params = {}
+    for item in filter(None, params.split(",")):
+        name, _, value = item.partition("=")
+        search_params[name] = float(value) if "." in value else int(value)
+    return factory, search_params
+
+
+def resolve_factory(factory: str, num_vectors: int, dimension: int) -> Optional[str]:
+    """Fill in corpus-dependent placeholders; None if the corpus is too small for this index type."""
+    nlist = min(int(4 * np.sqrt(num_vectors)), num_vectors // 39)
+    if "{nlist}" in factory and nlist < 4:
+        return None
+    pq_m = next((m for m in (32, 16, 8) if dimension % m == 0), None)
+    if "{pq_m}" in factory and (pq_m is None or num_vectors < 256 * 39):
+        return None
+    return factory.format(nlist=nlist, pq_m=pq_m)
+
+
+def embed_corpus(sentences: List[str], embedder: SentenceTransformer, embed_limit: int,
+                 seed: int) -> Tuple[np.ndarray, dict]:
+    """Embed up to embed_limit sentences, timing it, and resample the rest if the corpus is larger."""
+    sample = sentences[:embed_limit]
+    rss_before = current_rss_bytes()
+    start = time.perf_counter()
+    embedded = encode_sentences(sample, embedder, verbose=False)
+    seconds = time.perf_counter() - start
+    faiss.normalize_L2(embedded)
+
+    stats = {
+        "sentences": len(sample),
+        "seconds": seconds,
+        "sentences_per_second": len(sample) / max(seconds, 1e-9),
+        "rss_delta_bytes": (current_rss_bytes() - rss_before) if rss_before is not None else None,
+        "vectors": "model",
+    }
+    if len(sentences) <= len(sample):
+        return embedded, stats
+
+    rng = np.random.default_rng(seed)
+    source = rng.integers(0, len(embedded), size=len(sentences) - len(embedded))
+    noise = rng.normal(scale=0.05, size=(len(source), embedded.shape[1])).astype(np.float32)
+    extra = embedded[source] + noise
+    faiss.normalize_L2(extra)
+    stats["vectors"] = "resampled"
+    return np.concatenate([embedded, extra]), stats
+
+
+def measure_qps(search, queries: np.ndarray, batch_size: int, min_seconds: float = 0.5) -> float:
+    """Queries per second when searching in batches of batch_size, repeated until min_seconds elapsed."""
+    searched = 0
+    start = time.perf_counter()
+    while True:
+        for offset in range(0, len(queries), batch_size):
+            batch = queries[offset:offset + batch_size]
+            search(batch)
+            searched += len(batch)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return searched / elapsed
+
+
+def benchmark_index(factory: str, search_params: dict, database: np.ndarray, queries: np.ndarray,
+                    ground_truth: np.ndarray, k: int, batch_sizes: List[int]) -> dict:
+    dimension = database.shape[1]
+    rss_before = current_rss_bytes()
+    index = faiss.index_factory(dimension, factory, faiss.METRIC_INNER_PRODUCT)
+
+    start = time.perf_counter()
+    index.train(database)
+    train_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    index.add(database)
+    add_seconds = time.perf_counter() - start
+    rss_after = current_rss_bytes()
+
+    parameter_space = faiss.ParameterSpace()
+    for name, value in search_params.items():
+        parameter_space.set_index_parameter(index, name, value)
+
+    _, found = index.search(queries, k)
+    return {
+        "index_factory": factory,
+        "search_params": search_params,
+        "train_seconds": train_seconds,
+        "add_seconds": add_seconds,
+        "add_vectors_per_second": len(database) / max(add_seconds, 1e-9),
+        "index_bytes": _faiss_index_size_bytes(index),
+        "rss_delta_bytes": (rss_after - rss_before) if rss_before is not None else None,
+        "recall_at_k": _recall_at_k(found, ground_truth),
+        "qps": {str(b): measure_qps(lambda batch: index.search(batch, k), queries, b) for b in batch_sizes},
+    }
+
+
+def benchmark_corpus(name: str, sentences: List[str], query_texts: List[str], embedder: SentenceTransformer,
+                     index_types: List[str], batch_sizes: List[int], k: int, embed_limit: int, seed: int) -> dict:
+    print(f"\n📊 {name}: {len(sentences)} sentences")
+    embeddings, embedding_stats = embed_corpus(sentences, embedder, embed_limit, seed)
+    print(f"  embedding: {embedding_stats['sentences_per_second']:.0f} sentences/s ({embedding_stats['vectors']} vectors)")
+
+    queries = encode_sentences(query_texts, embedder, verbose=False)
+    faiss.normalize_L2(queries)
+    k = min(k, len(embeddings))
+
+    exact = faiss.IndexFlatIP(embeddings.shape[1])
+    exact.add(embeddings)
+    _, ground_truth = exact.search(queries, k)
+
+    results = []
+    for spec in index_types:
+        factory, search_params = parse_index_type(spec)
+        resolved = resolve_factory(factory, len(embeddings), embeddings.shape[1])
+        if resolved is None:
+            print(f"  {factory}: skipped, corpus too small")
+            continue
+        row = benchmark_index(resolved, search_params, embeddings, queries, ground_truth, k, batch_sizes)
+        results.append(row)
+        qps = ", ".join(f"b{b}={q:.0f}" for b, q in row["qps"].items())
+        print(f"  {resolved:<22} train {row['train_seconds']:.2f}s  add {row['add_seconds']:.2f}s  "
+              f"{row['index_bytes'] / 1e6:.1f} MB  recall@{k} {row['recall_at_k']:.3f}  QPS {qps}")
+
+    # End-to-end retrieval (query encoding + exact search) as the notebook runs it
+    retrieve_qps = {}
+    for batch_size in batch_sizes:
+        batches = [query_texts[i:i + batch_size] for i in range(0, len(query_texts), batch_size)]
+        start = time.perf_counter()
+        for batch in batches:
+            batch_rag_retrieve(batch, sentences, exact, embedder, k=k, batch_size=batch_size)
+        retrieve_qps[str(batch_size)] = len(query_texts) / max(time.perf_counter() - start, 1e-9)
+    print("  batch_rag_retrieve QPS: " + ", ".join(f"b{b}={q:.0f}" for b, q in retrieve_qps.items()))
+
+    return {
+        "corpus": name,
+        "num_sentences": len(sentences),
+        "num_queries": len(query_texts),
+        "dimension": int(embeddings.shape[1]),
+        "k": k,
+        "embedding": embedding_stats,
+        "indexes": results,
+        "batch_rag_retrieve_qps": retrieve_qps,
+    }
+
+
+def environment_info(model_name: str, seed: int) -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "faiss": getattr(faiss, "__version__", None),
+        "numpy": np.__version__,
+        "faiss_omp_threads": faiss.omp_get_max_threads(),
+        "model": model_name,
+        "seed": seed,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="synthetic corpus sizes in sentences")
+    parser.add_argument("--pdf", help="benchmark this PDF instead of synthetic corpora")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--index-types", nargs="+", default=list(DEFAULT_INDEX_TYPES),
+                        help='FAISS factory strings with optional search params, e.g. "HNSW32:efSearch=64"')
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--embed-limit", type=int, default=50000,
+                        help="embed at most this many sentences; larger corpora are resampled")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args(argv)
+
+    embedder = SentenceTransformer(args.model)
+    runs = []
+
+    if args.pdf:
+        sentences = split_text_into_sentences(extract_text_from_pdf(args.pdf))
+        rng = np.random.default_rng(args.seed)
+        query_ids = rng.choice(len(sentences), size=min(args.num_queries, len(sentences)), replace=False)
+        runs.append(benchmark_corpus(os.path.basename(args.pdf), sentences, [sentences[i] for i in query_ids],
+                                     embedder, args.index_types, args.batch_sizes, args.k, args.embed_limit, args.seed))
+    else:
+        # Queries come from a separate seed so they are never verbatim corpus sentences
+        query_texts = synthetic_sentences(args.num_queries, seed=args.seed + 1)
+        for size in args.sizes:
+            runs.append(benchmark_corpus(f"synthetic-{size}", synthetic_sentences(size, seed=args.seed), query_texts,
+                                         embedder, args.index_types, args.batch_sizes, args.k, args.embed_limit,
+                                         args.seed))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({"environment": environment_info(args.model, args.seed), "runs": runs}, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+from typing import List, Optional, Protocol, Sequence, Union
+
+import numpy as np
+import faiss
+
+from utils import INDEX_CACHE_DIR, _recall_at_k
+
+try:
+    import onnxruntime as ort
+except ImportError:  # only needed for the ONNX backend
+    ort = None
+
+
+class Embedder(Protocol):
+    """What the FAISS utilities need from an embedder; SentenceTransformer already satisfies it.
+
+    A `tokenizer` attribute (Hugging Face style) is optional and enables token-length
+    bucketing in encode_sentences and exact token counts in make_token_counter.
+    """
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray: ...
+
+    def get_sentence_embedding_dimension(self) -> int: ...
+
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model_int8.onnx"
+ONNX_CONFIG_FILE = "embedder_config.json"
+
+
+def _require_onnxruntime():
+    if ort is None:
+        raise ImportError("The ONNX backend needs onnxruntime: pip install onnxruntime")
+
+
+def export_onnx_embedder(model_name: str, output_dir: str, quantize: bool = True, opset: int = 17) -> str:
+    """Export a SentenceTransformer's transformer to ONNX, optionally with dynamic int8 weight quantization.
+
+    Pooling and normalization are read from the SentenceTransformer modules and applied in
+    numpy at encode time, so the exported graph only contains the transformer. Needs torch
+    and sentence-transformers at export time only.
+    """
+    _require_onnxruntime()
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0]
+    pooling = next((module for module in model if type(module).__name__ == "Pooling"), None)
+    pooling_config = pooling.get_config_dict() if pooling is not None else {}
+    if pooling_config.get("pooling_mode_cls_token"):
+        pooling_mode = "cls"
+    elif pooling_config.get("pooling_mode_max_tokens"):
+        pooling_mode = "max"
+    else:
+        pooling_mode = "mean"
+
+    os.makedirs(output_dir, exist_ok=True)
+    transformer.tokenizer.save_pretrained(output_dir)
+
+    sample = transformer.tokenizer(["An example sentence for tracing."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    class _LastHiddenState(torch.nn.Module):
+        """Positional inputs in input_names order, since model signatures differ between architectures."""
+
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHiddenState(transformer.auto_model.eval()), tuple(sample[name] for name in input_names), model_path,
+            input_names=input_names, output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes, opset_version=opset, dynamo=False,
+        )
+
+    if quantize:
+        # Dynamic quantization: int8 weights, activations quantized per batch at run time
+        quantize_dynamic(model_path, os.path.join(output_dir, ONNX_QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+
+    config = {
+        "model_name": model_name,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "pooling_mode": pooling_mode,
+        "normalize": any(type(module).__name__ == "Normalize" for module in model),
+        "quantized": quantize,
+    }
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+
+    print(f"✅ Exported {model_name} to {output_dir}{' (int8)' if quantize else ''}")
+    return output_dir
+
+
+class OnnxEmbedder:
+    """CPU embedder running an exported transformer with ONNX Runtime.
+
+    Drop-in for SentenceTransformer in the FAISS utilities. Each encode call sorts its
+    sentences by length so batches carry little padding, then restores input order.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = True, num_threads: Optional[int] = None):
+        _require_onnxruntime()
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), encoding='utf-8') as f:
+            self.config = json.load(f)
+        if quantized and not self.config.get("quantized"):
+            raise ValueError(f"{model_dir} has no quantized model; export it with quantize=True")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        model_file = ONNX_QUANTIZED_MODEL_FILE if quantized else ONNX_MODEL_FILE
+        self.session = ort.InferenceSession(os.path.join(model_dir, model_file), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = self.config["max_seq_length"]
+        self.quantized = quantized
+        # Distinct name for index_cache_key, since these vectors differ from the float32 model's
+        self.cache_name = f"{self.config['model_name']}:onnx{'-int8' if quantized else ''}"
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dimension"]
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        mode = self.config["pooling_mode"]
+        if mode == "cls":
+            return hidden[:, 0]
+        mask = attention_mask[..., None].astype(np.float32)
+        if mode == "max":
+            return np.where(mask > 0, hidden, -np.inf).max(axis=1)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences: Union[str, Sequence[str]], batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if not len(sentences):
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        order = np.argsort([-len(sentence) for sentence in sentences], kind="stable")
+        embeddings = np.empty((len(sentences), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            positions = order[start:start + batch_size]
+            inputs = self.tokenizer([sentences[i] for i in positions], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors="np")
+            feed = {name: inputs[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+            embeddings[positions] = self._pool(hidden, inputs["attention_mask"])
+
+        if self.config["normalize"] or normalize_embeddings:
+            faiss.normalize_L2(embeddings)
+        return embeddings[0] if single else embeddings
+
+
+def load_embedder(model_name: str = "all-MiniLM-L6-v2", backend: str = "sentence-transformers",
+                  quantized: bool = True, onnx_dir: Optional[str] = None, num_threads: Optional[int] = None) -> Embedder:
+    """Load an embedder by backend: "sentence-transformers" (float32 PyTorch) or "onnx" (ONNX Runtime, int8 by default).
+
+    The ONNX model is exported on first use into onnx_dir, by default under the index cache directory.
+    """
+    if backend == "sentence-transformers":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend != "onnx":
+        raise ValueError(f"backend must be 'sentence-transformers' or 'onnx', got {backend!r}")
+
+    onnx_dir = onnx_dir or os.path.join(INDEX_CACHE_DIR, "onnx", model_name.replace("/", "__"))
+    model_file = ONNX_QUANTIZED_MODEL_FILE if quantized else ONNX_MODEL_FILE
+    if not os.path.exists(os.path.join(onnx_dir, model_file)):
+        export_onnx_embedder(model_name, onnx_dir, quantize=quantized)
+    return OnnxEmbedder(onnx_dir, quantized=quantized, num_threads=num_threads)
+
+
+def _timed_encode(embedder: Embedder, sentences: List[str], batch_size: int):
+    start = time.perf_counter()
+    embeddings = np.asarray(embedder.encode(sentences, batch_size=batch_size, convert_to_numpy=True), dtype=np.float32)
+    return embeddings, time.perf_counter() - start
+
+
+def check_embedding_parity(reference: Embedder, candidate: Embedder, sentences: List[str], k: int = 10,
+                           batch_size: int = 64) -> dict:
+    """Compare a candidate embedder against the reference on the same sentences.
+
+    Reports per-sentence cosine similarity between the two embeddings, neighbour recall@k
+    (how many of each sentence's reference top-k neighbours the candidate embeddings
+    also retrieve) and the encode throughput of both.
+    """
+    reference_embeddings, reference_seconds = _timed_encode(reference, sentences, batch_size)
+    candidate_embeddings, candidate_seconds = _timed_encode(candidate, sentences, batch_size)
+    faiss.normalize_L2(reference_embeddings)
+    faiss.normalize_L2(candidate_embeddings)
+
+    cosine = (reference_embeddings * candidate_embeddings).sum(axis=1)
+    k = min(k, len(sentences) - 1)
+    neighbours = []
+    for embeddings in (reference_embeddings, candidate_embeddings):
+        index = faiss.IndexFlatIP(embeddings.shape[1])
+        index.add(embeddings)
+        _, ids = index.search(embeddings, k + 1)
+        neighbours.append(ids[:, 1:])  # drop the sentence itself
+
+    return {
+        "sentences": len(sentences),
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+        "p01_cosine": float(np.percentile(cosine, 1)),
+        "neighbour_recall_at_k": _recall_at_k(neighbours[1], neighbours[0]),
+        "k": k,
+        "reference_sentences_per_second": len(sentences) / max(reference_seconds, 1e-9),
+        "candidate_sentences_per_second": len(sentences) / max(candidate_seconds, 1e-9),
+        "speedup": reference_seconds / max(candidate_seconds, 1e-9),
+    }
+
+
+def print_parity_report(report: dict):
+    print(f"📏 Parity over {report['sentences']} sentences:")
+    print(f"  cosine to reference: mean {report['mean_cosine']:.4f}, p1 {report['p01_cosine']:.4f}, min {report['min_cosine']:.4f}")
+    print(f"  neighbour recall@{report['k']}: {report['neighbour_recall_at_k']:.3f}")
+    print(f"  throughput: {report['reference_sentences_per_second']:.0f} -> "
+          f"{report['candidate_sentences_per_second']:.0f} sentences/s ({report['speedup']:.2f}x)")
@@ -0,0 +1,160 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sentence_transformers import SentenceTransformer
+
+from utils import RetrievalResult
+
+
+# Keep codes such as "E-401", "v2.3" or "AB_12" as single tokens
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over a sentence list, precomputed as a SciPy CSR sentence x term weight matrix.
+
+    Scoring a batch of queries is one sparse-sparse product of the query term matrix with the
+    transposed weight matrix.
+    """
+
+    def __init__(self, sentences: List[str], k1: float = 1.5, b: float = 0.75):
+        self.vocabulary: Dict[str, int] = {}
+        rows, cols = [], []
+        for row, sentence in enumerate(sentences):
+            for term in tokenize(sentence):
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+
+        shape = (len(sentences), max(1, len(self.vocabulary)))
+        # Duplicate (row, col) pairs are summed into term frequencies
+        term_freqs = sp.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+        term_freqs.sum_duplicates()
+
+        doc_lengths = np.asarray(term_freqs.sum(axis=1)).ravel()
+        avg_length = doc_lengths.mean() if len(doc_lengths) else 0.0
+        doc_freqs = np.bincount(term_freqs.indices, minlength=shape[1])
+        self.idf = np.log1p((len(sentences) - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+        tf = term_freqs.data
+        length_norm = np.repeat(k1 * (1 - b + b * doc_lengths / max(avg_length, 1e-9)), np.diff(term_freqs.indptr))
+        weights = term_freqs.copy()
+        weights.data = (self.idf[term_freqs.indices] * tf * (k1 + 1) / (tf + length_norm)).astype(np.float32)
+        self.weights_t = weights.T.tocsr()  # term x sentence, for query @ weights_t
+        self.num_sentences = len(sentences)
+
+    def query_matrix(self, query_texts: List[str]) -> sp.csr_matrix:
+        """Binary query x term matrix; terms unknown to the corpus are ignored."""
+        rows, cols = [], []
+        for row, query in enumerate(query_texts):
+            for term in set(tokenize(query)):
+                col = self.vocabulary.get(term)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        return sp.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                             shape=(len(query_texts), self.weights_t.shape[0]))
+
+    def score(self, query_texts: List[str]) -> sp.csr_matrix:
+        """Sparse query x sentence BM25 scores."""
+        return (self.query_matrix(query_texts) @ self.weights_t).tocsr()
+
+    def search(self, query_texts: List[str], k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Top-k (sentence ids, scores) per query; sentences without a matching term are never returned."""
+        scores = self.score(query_texts)
+        results = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            ids, values = scores.indices[start:end], scores.data[start:end]
+            if len(values) > k:
+                top = np.argpartition(-values, k)[:k]
+                ids, values = ids[top], values[top]
+            order = np.argsort(-values, kind="stable")
+            results.append((ids[order], values[order]))
+        return results
+
+
+def _min_max(scores: Dict[int, float]) -> Dict[int, float]:
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    span = high - low
+    return {sentence_id: (score - low) / span if span else 1.0 for sentence_id, score in scores.items()}
+
+
+class HybridRetriever:
+    """Dense FAISS search fused with BM25 over the same sentence list.
+
+    fusion="rrf" uses reciprocal-rank fusion (sum of 1 / (rrf_k + rank)); fusion="weighted" blends
+    min-max normalized scores as alpha * dense + (1 - alpha) * sparse. With prefilter_codes, queries
+    containing code-like terms (tokens with a digit, e.g. part numbers or error codes) that occur in
+    the corpus only return sentences containing one of those terms.
+    """
+
+    def __init__(self, sentences: List[str], index, embedder: SentenceTransformer, bm25: Optional[BM25Index] = None,
+                 fusion: str = "rrf", alpha: float = 0.5, rrf_k: int = 60, prefilter_codes: bool = True):
+        if fusion not in ("rrf", "weighted"):
+            raise ValueError(f"fusion must be 'rrf' or 'weighted', got {fusion!r}")
+        self.sentences = sentences
+        self.index = index
+        self.embedder = embedder
+        self.bm25 = bm25 or BM25Index(sentences)
+        self.fusion = fusion
+        self.alpha = alpha
+        self.rrf_k = rrf_k
+        self.prefilter_codes = prefilter_codes
+
+    def _fuse(self, dense: Dict[int, float], sparse: Dict[int, float]) -> Dict[int, float]:
+        if self.fusion == "rrf":
+            fused: Dict[int, float] = {}
+            for ranking in (dense, sparse):
+                for rank, sentence_id in enumerate(sorted(ranking, key=ranking.get, reverse=True), 1):
+                    fused[sentence_id] = fused.get(sentence_id, 0.0) + 1.0 / (self.rrf_k + rank)
+            return fused
+        dense_norm, sparse_norm = _min_max(dense), _min_max(sparse)
+        return {sentence_id: self.alpha * dense_norm.get(sentence_id, 0.0)
+                + (1 - self.alpha) * sparse_norm.get(sentence_id, 0.0)
+                for sentence_id in set(dense) | set(sparse)}
+
+    def _code_matches(self, query_text: str) -> Optional[set]:
+        """Sentence ids containing any code-like query term, or None if the query has none in the corpus."""
+        code_terms = [term for term in set(tokenize(query_text))
+                      if any(ch.isdigit() for ch in term) and term in self.bm25.vocabulary]
+        if not code_terms:
+            return None
+        matches = self.bm25.weights_t[[self.bm25.vocabulary[term] for term in code_terms]]
+        return set(matches.indices.tolist())
+
+    def search(self, query_texts: List[str], k: int = 3, candidates: Optional[int] = None) -> List[RetrievalResult]:
+        """Batched hybrid retrieval: one encode, one index.search and one sparse product for all queries."""
+        if not query_texts:
+            return []
+        candidates = candidates or max(4 * k, 20)
+
+        query_embeddings = np.ascontiguousarray(self.embedder.encode(query_texts, convert_to_numpy=True), dtype=np.float32)
+        dense_scores, dense_ids = self.index.search(query_embeddings, candidates)
+        sparse_results = self.bm25.search(query_texts, candidates)
+
+        results = []
+        for row, query_text in enumerate(query_texts):
+            dense = {int(i): float(d) for i, d in zip(dense_ids[row], dense_scores[row]) if 0 <= i < len(self.sentences)}
+            sparse = {int(i): float(s) for i, s in zip(*sparse_results[row])}
+            fused = self._fuse(dense, sparse)
+
+            if self.prefilter_codes:
+                allowed = self._code_matches(query_text)
+                if allowed:
+                    fused = {sentence_id: score for sentence_id, score in fused.items() if sentence_id in allowed} or fused
+
+            result = RetrievalResult(query=query_text, embedding=query_embeddings[row])
+            for sentence_id in sorted(fused, key=fused.get, reverse=True)[:k]:
+                result.ids.append(sentence_id)
+                result.scores.append(fused[sentence_id])
+                result.sentences.append(self.sentences[sentence_id])
+            results.append(result)
+        return results
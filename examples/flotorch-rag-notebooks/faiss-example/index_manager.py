@@ -0,0 +1,318 @@
+import os
+import json
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import faiss
+from sentence_transformers import SentenceTransformer
+
+from utils import RetrievalResult, min_training_points
+
+
+class IncrementalFaissIndex:
+    """FAISS index with stable sentence IDs that supports adding and removing whole documents.
+
+    The index is an IndexIDMap2 around any factory layout that supports
+    remove_ids (Flat, IVF-Flat, IVF-PQ). Each document's vectors are kept in
+    their own .npy file, so updates only touch new documents; the full set is
+    read back only when the IVF coarse quantizer has to be retrained.
+
+    Layouts that need training buffer documents until MIN_POINTS_PER_CENTROID
+    vectors per centroid are available; until then buffered documents are
+    searched exactly. Retraining is triggered when residual drift or list
+    imbalance grows by more than the given fraction over the values measured
+    right after the last training, and is checked once per update batch.
+    """
+
+    INDEX_FILE = "index.faiss"
+    MAPPING_FILE = "mapping.json"
+    VECTORS_DIR = "vectors"
+    # Drift is only judged once this fraction of the index was added since training
+    MIN_DRIFT_FRACTION = 0.05
+    # FAISS warns below ~39 training points per centroid (coarse or PQ codebook)
+    MIN_POINTS_PER_CENTROID = 39
+
+    def __init__(self, directory: str, dimension: int, index_factory: str = "Flat",
+                 drift_threshold: float = 0.25, imbalance_growth: float = 0.5):
+        self.directory = directory
+        self.dimension = dimension
+        self.index_factory = index_factory
+        self.drift_threshold = drift_threshold
+        self.imbalance_growth = imbalance_growth
+
+        self.index = self._new_index()
+        self.sentences: Dict[int, str] = {}
+        self.sentence_docs: Dict[int, str] = {}
+        self.documents: Dict[str, List[int]] = {}
+        # Documents stored but not yet in the index because it is still untrained
+        self.pending: List[str] = []
+        self.next_id = 0
+
+        # Mean squared distance of vectors to their coarse centroid at train time,
+        # and a running mean over everything added since
+        self.baseline_residual: Optional[float] = None
+        self.added_residual_sum = 0.0
+        self.added_residual_count = 0
+        # List imbalance of the training set right after training
+        self.baseline_imbalance: Optional[float] = None
+
+        os.makedirs(os.path.join(directory, self.VECTORS_DIR), exist_ok=True)
+
+    def _new_index(self):
+        return faiss.IndexIDMap2(faiss.index_factory(self.dimension, self.index_factory, faiss.METRIC_INNER_PRODUCT))
+
+    @property
+    def _ivf(self):
+        """The underlying IVF index, or None for non-IVF layouts."""
+        try:
+            return faiss.extract_index_ivf(self.index.index)
+        except RuntimeError:
+            return None
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal + sum(len(self.documents[doc_id]) for doc_id in self.pending)
+
+    @property
+    def train_size(self) -> int:
+        """Vectors needed before the layout can be trained (0 for layouts without training)."""
+        if self.index.is_trained:
+            return 0
+        ivf = self._ivf
+        return max(self.MIN_POINTS_PER_CENTROID * (ivf.nlist if ivf is not None else 256), min_training_points(self.index.index))
+
+    def _vectors_path(self, doc_id: str) -> str:
+        # Document IDs may be paths or URLs, so name vector files by hash
+        file_name = hashlib.sha1(doc_id.encode("utf-8")).hexdigest() + ".npy"
+        return os.path.join(self.directory, self.VECTORS_DIR, file_name)
+
+    def _residuals(self, vectors: np.ndarray) -> np.ndarray:
+        """Squared L2 distance from each vector to its assigned coarse centroid."""
+        quantizer = self._ivf.quantizer
+        _, assignments = quantizer.search(vectors, 1)
+        centroids = quantizer.reconstruct_batch(assignments[:, 0])
+        return ((vectors - centroids) ** 2).sum(axis=1)
+
+    def _load_vectors(self, doc_ids: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        vectors, ids = [], []
+        for doc_id in doc_ids:
+            vectors.append(np.load(self._vectors_path(doc_id)))
+            ids.append(np.array(self.documents[doc_id], dtype=np.int64))
+        if not vectors:
+            return np.zeros((0, self.dimension), dtype=np.float32), np.zeros(0, dtype=np.int64)
+        return np.concatenate(vectors), np.concatenate(ids)
+
+    def _train_and_add(self, vectors: np.ndarray, ids: np.ndarray):
+        """Train on the given vectors, add them, and record the post-training baselines."""
+        print(f"Training {self.index_factory} on {len(vectors)} vectors...")
+        self.index.train(vectors)
+        self.index.add_with_ids(vectors, ids)
+        if self._ivf is not None:
+            self.baseline_residual = float(self._residuals(vectors).mean())
+            self.baseline_imbalance = self.list_imbalance()
+        self.added_residual_sum = 0.0
+        self.added_residual_count = 0
+
+    def _train_pending(self):
+        """Train once enough vectors are buffered, then move buffered documents into the index."""
+        if not self.pending or self.ntotal < self.train_size:
+            return
+        vectors, ids = self._load_vectors(self.pending)
+        self._train_and_add(vectors, ids)
+        self.pending = []
+
+    def list_imbalance(self) -> float:
+        """FAISS imbalance factor of the inverted lists (1.0 is perfectly balanced)."""
+        ivf = self._ivf
+        if ivf is None or ivf.ntotal == 0:
+            return 1.0
+        sizes = np.array([ivf.invlists.list_size(i) for i in range(ivf.nlist)], dtype=np.float64)
+        return float(ivf.nlist * (sizes ** 2).sum() / sizes.sum() ** 2)
+
+    def drift(self) -> float:
+        """Relative growth of the centroid residual of vectors added since the last training."""
+        if not self.baseline_residual or not self.added_residual_count:
+            return 0.0
+        added_mean = self.added_residual_sum / self.added_residual_count
+        return added_mean / self.baseline_residual - 1.0
+
+    def imbalance_growth_ratio(self) -> float:
+        """Relative growth of the list imbalance since the last training."""
+        if not self.baseline_imbalance:
+            return 0.0
+        return self.list_imbalance() / self.baseline_imbalance - 1.0
+
+    def needs_retrain(self) -> bool:
+        if self._ivf is None or not self.index.is_trained:
+            return False
+        drift_measurable = self.added_residual_count >= self.MIN_DRIFT_FRACTION * self.ntotal
+        return ((drift_measurable and self.drift() > self.drift_threshold)
+                or self.imbalance_growth_ratio() > self.imbalance_growth)
+
+    def _add(self, doc_id: str, sentences: List[str], vectors: np.ndarray) -> List[int]:
+        ids = np.arange(self.next_id, self.next_id + len(sentences), dtype=np.int64)
+        self.next_id += len(sentences)
+        np.save(self._vectors_path(doc_id), vectors)
+
+        id_list = ids.tolist()
+        self.documents[doc_id] = id_list
+        for sentence_id, sentence in zip(id_list, sentences):
+            self.sentences[sentence_id] = sentence
+            self.sentence_docs[sentence_id] = doc_id
+
+        if not self.index.is_trained:
+            self.pending.append(doc_id)
+            print(f"Buffered {len(id_list)} sentences from {doc_id} ({self.ntotal}/{self.train_size} needed to train)")
+            return id_list
+
+        self.index.add_with_ids(vectors, ids)
+        if self._ivf is not None:
+            residuals = self._residuals(vectors)
+            self.added_residual_sum += float(residuals.sum())
+            self.added_residual_count += len(residuals)
+        print(f"Added {len(id_list)} sentences from {doc_id} (index size: {self.ntotal})")
+        return id_list
+
+    def _remove(self, doc_id: str) -> int:
+        ids = self.documents.pop(doc_id, [])
+        if not ids:
+            return 0
+
+        if doc_id in self.pending:
+            self.pending.remove(doc_id)
+            removed = len(ids)
+        else:
+            removed = int(self.index.remove_ids(np.array(ids, dtype=np.int64)))
+        for sentence_id in ids:
+            self.sentences.pop(sentence_id, None)
+            self.sentence_docs.pop(sentence_id, None)
+        vectors_path = self._vectors_path(doc_id)
+        if os.path.exists(vectors_path):
+            os.remove(vectors_path)
+
+        print(f"Removed {removed} sentences from {doc_id} (index size: {self.ntotal})")
+        return removed
+
+    def add_documents(self, documents: Dict[str, List[str]], embedder: SentenceTransformer) -> Dict[str, List[int]]:
+        """Embed and append several documents, replacing previous versions; the retrain check runs once at the end."""
+        added = {}
+        for doc_id, sentences in documents.items():
+            self._remove(doc_id)
+            if not sentences:
+                added[doc_id] = []
+                continue
+            vectors = np.ascontiguousarray(embedder.encode(sentences, convert_to_numpy=True), dtype=np.float32)
+            added[doc_id] = self._add(doc_id, sentences, vectors)
+        self._train_pending()
+        self.maybe_retrain()
+        return added
+
+    def add_document(self, doc_id: str, sentences: List[str], embedder: SentenceTransformer) -> List[int]:
+        """Embed and append a document's sentences, replacing any previous version of the document."""
+        return self.add_documents({doc_id: sentences}, embedder)[doc_id]
+
+    def remove_documents(self, doc_ids: Iterable[str]) -> int:
+        """Remove several documents; returns the number of vectors removed."""
+        removed = sum(self._remove(doc_id) for doc_id in doc_ids)
+        self.maybe_retrain()
+        return removed
+
+    def remove_document(self, doc_id: str) -> int:
+        """Remove every sentence of a document; returns the number of vectors removed."""
+        return self.remove_documents([doc_id])
+
+    def maybe_retrain(self) -> bool:
+        """Retrain the coarse quantizer if drift or list imbalance grew past its threshold since training."""
+        if not self.needs_retrain():
+            return False
+        print(f"Retraining: drift={self.drift():.2f}, imbalance growth={self.imbalance_growth_ratio():.2f}")
+        self.retrain()
+        return True
+
+    def retrain(self):
+        """Rebuild the index from the stored per-document vectors, keeping all sentence IDs."""
+        self.index = self._new_index()
+        self.pending = list(self.documents)
+        self.baseline_residual = self.baseline_imbalance = None
+        self._train_pending()
+
+    def search(self, query_matrix: np.ndarray, k: int):
+        """Search the index; returned ids are stable sentence IDs."""
+        query_matrix = np.ascontiguousarray(query_matrix, dtype=np.float32)
+        if self.index.is_trained:
+            return self.index.search(query_matrix, k)
+
+        # Not enough vectors to train yet: exact search over the buffered documents
+        exact = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+        vectors, ids = self._load_vectors(self.pending)
+        if len(ids):
+            exact.add_with_ids(vectors, ids)
+        return exact.search(query_matrix, k)
+
+    def retrieve(self, query_texts: List[str], embedder: SentenceTransformer, k: int = 3) -> List[RetrievalResult]:
+        """Batched retrieval returning one RetrievalResult per query."""
+        if not query_texts:
+            return []
+        query_embeddings = np.ascontiguousarray(embedder.encode(query_texts, convert_to_numpy=True), dtype=np.float32)
+        distances, indices = self.search(query_embeddings, k)
+
+        results = []
+        for query_text, query_embedding, row_distances, row_indices in zip(query_texts, query_embeddings, distances, indices):
+            result = RetrievalResult(query=query_text, embedding=query_embedding)
+            for score, sentence_id in zip(row_distances, row_indices):
+                if sentence_id in self.sentences:
+                    result.ids.append(int(sentence_id))
+                    result.scores.append(float(score))
+                    result.sentences.append(self.sentences[sentence_id])
+            results.append(result)
+        return results
+
+    def save(self):
+        """Persist the index and the sentence-to-ID mapping next to it."""
+        faiss.write_index(self.index, os.path.join(self.directory, self.INDEX_FILE))
+        mapping = {
+            "dimension": self.dimension,
+            "index_factory": self.index_factory,
+            "drift_threshold": self.drift_threshold,
+            "imbalance_growth": self.imbalance_growth,
+            "next_id": self.next_id,
+            "baseline_residual": self.baseline_residual,
+            "baseline_imbalance": self.baseline_imbalance,
+            "pending": self.pending,
+            "added_residual_sum": self.added_residual_sum,
+            "added_residual_count": self.added_residual_count,
+            "documents": self.documents,
+            "sentences": {str(sentence_id): sentence for sentence_id, sentence in self.sentences.items()},
+        }
+        mapping_path = os.path.join(self.directory, self.MAPPING_FILE)
+        with open(mapping_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(mapping, f, ensure_ascii=False)
+        os.replace(mapping_path + ".tmp", mapping_path)
+
+    @classmethod
+    def load(cls, directory: str) -> "IncrementalFaissIndex":
+        """Load an index and its mapping previously written by save()."""
+        with open(os.path.join(directory, cls.MAPPING_FILE), 'r', encoding='utf-8') as f:
+            mapping = json.load(f)
+
+        manager = cls(directory, mapping["dimension"], mapping["index_factory"],
+                      mapping["drift_threshold"], mapping["imbalance_growth"])
+        manager.index = faiss.read_index(os.path.join(directory, cls.INDEX_FILE))
+        manager.next_id = mapping["next_id"]
+        manager.baseline_residual = mapping["baseline_residual"]
+        manager.baseline_imbalance = mapping["baseline_imbalance"]
+        manager.pending = mapping["pending"]
+        manager.added_residual_sum = mapping["added_residual_sum"]
+        manager.added_residual_count = mapping["added_residual_count"]
+        manager.documents = mapping["documents"]
+        manager.sentences = {int(sentence_id): sentence for sentence_id, sentence in mapping["sentences"].items()}
+        manager.sentence_docs = {sentence_id: doc_id for doc_id, ids in manager.documents.items() for sentence_id in ids}
+        return manager
+
+    @classmethod
+    def open(cls, directory: str, dimension: int, index_factory: str = "Flat", **thresholds) -> "IncrementalFaissIndex":
+        """Load the index in `directory` if one was saved there, otherwise start an empty one."""
+        if os.path.exists(os.path.join(directory, cls.MAPPING_FILE)):
+            return cls.load(directory)
+        return cls(directory, dimension, index_factory, **thresholds)
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; /proc is used on Linux without it
+    psutil = None
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None if it cannot be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _RssSampler(threading.Thread):
+    """Polls RSS in the background to capture the peak reached during a stage."""
+
+    def __init__(self, interval: float):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss_bytes()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            rss = current_rss_bytes()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def stop(self) -> Optional[int]:
+        self._stop_event.set()
+        self.join()
+        rss = current_rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+        return self.peak
+
+
+@dataclass
+class StageRecord:
+    """Measurements for one execution of a pipeline stage.
+
+    cpu_seconds is process CPU time, so it includes worker threads (FAISS, PyTorch)
+    and overlaps between concurrent stages.
+    """
+    name: str
+    start: float
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    rss_start_bytes: Optional[int] = None
+    rss_peak_bytes: Optional[int] = None
+    items: Optional[int] = None
+    tokens: Optional[int] = None
+    track: int = 0
+
+
+class PipelineProfiler:
+    """Records wall time, CPU time, peak RSS, item and token counts per pipeline stage.
+
+    Stages are marked with `with profiler.stage("encode", items=n) as record:` or the
+    `@profiler.profile("name")` decorator; counts can also be filled in on the record
+    inside the block. Disabled profilers cost one attribute check per stage.
+    """
+
+    def __init__(self, enabled: bool = True, rss_interval: float = 0.01):
+        self.enabled = enabled
+        self.rss_interval = rss_interval
+        self.records: List[StageRecord] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+        self._origin = time.perf_counter()
+
+    @staticmethod
+    def _track() -> int:
+        """Trace lane: the asyncio task if one is running (so concurrent calls do not overlap), else the thread."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        return id(task) if task is not None else threading.get_ident()
+
+    @contextmanager
+    def stage(self, name: str, items: Optional[int] = None, tokens: Optional[int] = None):
+        if not self.enabled:
+            yield StageRecord(name, 0.0, items=items, tokens=tokens)
+            return
+
+        record = StageRecord(name, time.perf_counter() - self._origin, items=items, tokens=tokens,
+                             rss_start_bytes=current_rss_bytes(), track=self._track())
+        sampler = _RssSampler(self.rss_interval)
+        sampler.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall_seconds = time.perf_counter() - wall_start
+            record.cpu_seconds = time.process_time() - cpu_start
+            record.rss_peak_bytes = sampler.stop()
+            with self._lock:
+                self.records.append(record)
+
+    def profile(self, name: Optional[str] = None):
+        """Decorator form of stage() for sync and async functions."""
+        def decorator(func):
+            stage_name = name or func.__name__
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.stage(stage_name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self) -> List[dict]:
+        """Per-stage totals, in order of first appearance."""
+        totals: Dict[str, dict] = {}
+        for record in self.records:
+            row = totals.setdefault(record.name, {
+                "stage": record.name, "calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                "peak_rss_mb": 0.0, "items": 0, "tokens": 0,
+            })
+            row["calls"] += 1
+            row["wall_seconds"] += record.wall_seconds
+            row["cpu_seconds"] += record.cpu_seconds
+            if record.rss_peak_bytes is not None:
+                row["peak_rss_mb"] = max(row["peak_rss_mb"], record.rss_peak_bytes / 1e6)
+            row["items"] += record.items or 0
+            row["tokens"] += record.tokens or 0
+        return list(totals.values())
+
+    def print_summary(self):
+        print(f"{'stage':<18} {'calls':>6} {'wall s':>9} {'cpu s':>9} {'peak RSS MB':>12} {'items':>9} {'tokens':>9} {'items/s':>9}")
+        print("-" * 88)
+        for row in self.summary():
+            rate = row["items"] / row["wall_seconds"] if row["wall_seconds"] and row["items"] else 0.0
+            print(f"{row['stage']:<18} {row['calls']:>6} {row['wall_seconds']:>9.3f} {row['cpu_seconds']:>9.3f} "
+                  f"{row['peak_rss_mb']:>12.1f} {row['items']:>9} {row['tokens']:>9} {rate:>9.1f}")
+
+    def write_chrome_trace(self, path: str):
+        """Write records in Chrome Trace Event format (open in chrome://tracing or ui.perfetto.dev)."""
+        tracks: Dict[int, int] = {}
+        events = []
+        for record in self.records:
+            tid = tracks.setdefault(record.track, len(tracks) + 1)
+            args = {key: value for key, value in asdict(record).items()
+                    if key not in ("name", "start", "wall_seconds", "track") and value is not None}
+            events.append({
+                "name": record.name, "ph": "X", "pid": os.getpid(), "tid": tid,
+                "ts": record.start * 1e6, "dur": record.wall_seconds * 1e6, "args": args,
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def write_json(self, path: str):
+        """Write raw records plus the per-stage summary as JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"records": [asdict(record) for record in self.records], "summary": self.summary()}, f, indent=2)
+
+
+# Shared profiler used by utils.py; disabled until PROFILER.enable() is called
+PROFILER = PipelineProfiler(enabled=False)
+profile_stage = PROFILER.stage
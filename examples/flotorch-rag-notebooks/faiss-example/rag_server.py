@@ -0,0 +1,287 @@
+"""Long-lived RAG query service around the FAISS utilities.
+
+The embedder and index are loaded once at startup. Questions that arrive
+within a few milliseconds of each other are gathered into one micro-batch
+so embedding and index.search run as a single batched call; the LLM calls
+for the batch then go out concurrently.
+
+Configuration (environment variables):
+    RAG_PDF_PATH          PDF to index (built once, then served from the on-disk cache)
+    RAG_EMBEDDING_MODEL   SentenceTransformer model name (default: all-MiniLM-L6-v2)
+    RAG_INDEX_FACTORY     optional FAISS factory string
+    RAG_MAX_BATCH_SIZE    largest micro-batch (default: 64)
+    RAG_MAX_WAIT_MS       how long the first question of a batch waits for company (default: 5)
+    RAG_MAX_LLM_CALLS     concurrent gateway calls (default: 16)
+    FLOTORCH_BASE_URL, FLOTORCH_MODEL, FLOTORCH_API_KEY
+
+Run with:
+    pip install fastapi uvicorn
+    uvicorn rag_server:app --host 0.0.0.0 --port 8000
+"""
+import os
+import time
+import asyncio
+import bisect
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+from sentence_transformers import SentenceTransformer
+
+from utils import PooledFlotorchLLM, RetrievalResult, batch_rag_retrieve, get_flotorch_client, load_or_build_faiss_index
+
+
+ANSWER_PROMPT = """Consider the following context from the document: {context}
+
+Now answer the following question using only the context provided: {query}
+
+Provide a clear and concise answer based on the information given."""
+
+
+class Histogram:
+    """Fixed-bucket histogram; latencies are recorded in milliseconds."""
+
+    LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+    BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound below which a fraction q of observations fall."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {f"le_{bound}": n for bound, n in zip(self.buckets + ("inf",), self.counts)},
+        }
+
+
+class MicroBatcher:
+    """Collects concurrent retrieval requests into batches for one encode + index.search call."""
+
+    def __init__(self, sentences, index, embedder: SentenceTransformer, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.sentences = sentences
+        self.index = index
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue: "asyncio.Queue" = asyncio.Queue()
+        self.batch_sizes = Histogram(Histogram.BATCH_SIZE_BUCKETS)
+        self.retrieval_latency = Histogram()
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    async def retrieve(self, question: str, k: int) -> RetrievalResult:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((question, k, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            questions = [question for question, _, _, _ in batch]
+            k = max(k for _, k, _, _ in batch)
+            try:
+                # Encoding and search are CPU-bound; keep the event loop free to accept requests
+                results = await loop.run_in_executor(
+                    None, batch_rag_retrieve, questions, self.sentences, self.index, self.embedder, k)
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+
+            for (_, request_k, future, enqueued_at), result in zip(batch, results):
+                # From enqueue, so the time spent waiting for the batch to fill and run is included
+                self.retrieval_latency.observe((finished - enqueued_at) * 1000)
+                if not future.done():
+                    future.set_result(RetrievalResult(result.query, result.ids[:request_k],
+                                                      result.scores[:request_k], result.sentences[:request_k],
+                                                      result.embedding))
+
+
+# Largest k a request may ask for; bounds the batch-wide search size
+MAX_K = 100
+
+
+class AskRequest(BaseModel):
+    question: str
+    k: int = Field(3, ge=1, le=MAX_K)
+
+
+class RetrieveRequest(BaseModel):
+    questions: List[str]
+    k: int = Field(3, ge=1, le=MAX_K)
+
+
+class Source(BaseModel):
+    id: int
+    score: float
+    sentence: str
+
+
+class AskResponse(BaseModel):
+    answer: str
+    tokens: Optional[int] = None
+    sources: List[Source]
+    retrieval_ms: float
+    llm_ms: float
+
+
+def _sources(result: RetrievalResult) -> List[Source]:
+    return [Source(id=i, score=s, sentence=t) for i, s, t in zip(result.ids, result.scores, result.sentences)]
+
+
+class ServerState:
+    batcher: MicroBatcher
+    llm: PooledFlotorchLLM
+    llm_slots: asyncio.Semaphore
+    llm_latency: Histogram
+    total_latency: Histogram
+    in_flight: int = 0
+
+
+state = ServerState()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pdf_path = os.environ["RAG_PDF_PATH"]
+    model_name = os.getenv("RAG_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+    embedder = SentenceTransformer(model_name)
+    sentences, index, _ = load_or_build_faiss_index(pdf_path, embedder, model_name,
+                                                    index_factory=os.getenv("RAG_INDEX_FACTORY") or None)
+
+    state.batcher = MicroBatcher(sentences, index, embedder,
+                                 max_batch_size=int(os.getenv("RAG_MAX_BATCH_SIZE", "64")),
+                                 max_wait_ms=float(os.getenv("RAG_MAX_WAIT_MS", "5")))
+    state.llm = get_flotorch_client(os.environ["FLOTORCH_BASE_URL"], os.environ["FLOTORCH_MODEL"],
+                                    os.environ["FLOTORCH_API_KEY"])
+    state.llm_slots = asyncio.Semaphore(int(os.getenv("RAG_MAX_LLM_CALLS", "16")))
+    state.llm_latency = Histogram()
+    state.total_latency = Histogram()
+    state.batcher.start()
+    print(f"✅ RAG server ready: {len(sentences)} sentences indexed from {pdf_path}")
+
+    yield
+
+    await state.batcher.stop()
+    await state.llm.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/retrieve")
+async def retrieve(request: RetrieveRequest):
+    results = await asyncio.gather(*(state.batcher.retrieve(q, request.k) for q in request.questions))
+    return [{"question": r.query, "sources": _sources(r)} for r in results]
+
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(request: AskRequest):
+    started = time.perf_counter()
+    state.in_flight += 1
+    try:
+        result = await state.batcher.retrieve(request.question, request.k)
+        retrieval_ms = (time.perf_counter() - started) * 1000
+
+        prompt = ANSWER_PROMPT.format(context=result.context, query=request.question)
+        llm_started = time.perf_counter()
+        async with state.llm_slots:
+            try:
+                response = await state.llm.ainvoke([{"role": "user", "content": prompt}])
+            except Exception as e:
+                raise HTTPException(status_code=502, detail=f"LLM gateway error: {e}")
+        llm_ms = (time.perf_counter() - llm_started) * 1000
+        state.llm_latency.observe(llm_ms)
+
+        tokens = response.metadata.get('totalTokens')
+        return AskResponse(
+            answer=response.content,
+            tokens=int(tokens) if str(tokens).isdigit() else None,
+            sources=_sources(result),
+            retrieval_ms=retrieval_ms,
+            llm_ms=llm_ms,
+        )
+    finally:
+        state.in_flight -= 1
+        state.total_latency.observe((time.perf_counter() - started) * 1000)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Queue depth, batch sizes and latency histograms (milliseconds)."""
+    return {
+        "queue_depth": state.batcher.queue_depth,
+        "in_flight": state.in_flight,
+        "batch_size": state.batcher.batch_sizes.snapshot(),
+        "retrieval_latency": state.batcher.retrieval_latency.snapshot(),
+        "llm_latency": state.llm_latency.snapshot(),
+        "total_latency": state.total_latency.snapshot(),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
@@ -0,0 +1,142 @@
+import os
+import json
+from typing import Optional
+
+import numpy as np
+import faiss
+
+from utils import _recall_at_k
+
+
+class ReducedPrecisionEmbeddings:
+    """Sentence embeddings stored on disk as float16, or int8 with a per-vector scale, and memory-mapped."""
+
+    VECTORS_FILE = "vectors.npy"
+    SCALES_FILE = "scales.npy"
+
+    def __init__(self, vectors: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.vectors = vectors
+        self.scales = scales
+
+    @property
+    def dtype(self) -> str:
+        return "int8" if self.scales is not None else "float16"
+
+    @classmethod
+    def save(cls, directory: str, sentence_embeddings: np.ndarray, dtype: str = "float16"):
+        """Write float32 embeddings at reduced precision."""
+        os.makedirs(directory, exist_ok=True)
+        embeddings = np.asarray(sentence_embeddings, dtype=np.float32)
+        if dtype == "float16":
+            np.save(os.path.join(directory, cls.VECTORS_FILE), embeddings.astype(np.float16))
+        elif dtype == "int8":
+            # Symmetric per-vector scale so every row uses the full int8 range
+            scales = np.abs(embeddings).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.round(embeddings / scales[:, None]).astype(np.int8)
+            np.save(os.path.join(directory, cls.VECTORS_FILE), codes)
+            np.save(os.path.join(directory, cls.SCALES_FILE), scales.astype(np.float32))
+        else:
+            raise ValueError(f"dtype must be 'float16' or 'int8', got {dtype!r}")
+
+    @classmethod
+    def load(cls, directory: str) -> "ReducedPrecisionEmbeddings":
+        vectors = np.load(os.path.join(directory, cls.VECTORS_FILE), mmap_mode='r')
+        scales_path = os.path.join(directory, cls.SCALES_FILE)
+        scales = np.load(scales_path, mmap_mode='r') if os.path.exists(scales_path) else None
+        return cls(vectors, scales)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def reconstruct(self, ids: np.ndarray) -> np.ndarray:
+        """float32 rows for the given ids; only those rows are read from disk."""
+        rows = np.asarray(self.vectors[ids], dtype=np.float32)
+        if self.scales is not None:
+            rows *= np.asarray(self.scales[ids], dtype=np.float32)[..., None]
+        return rows
+
+
+class RerankingIndex:
+    """Compact scalar-quantized FAISS index whose candidates are re-ranked against stored vectors.
+
+    search() fetches `rerank_factor * k` candidates from the SQ index and rescores them by
+    inner product with the float16/int8 vectors. The float32 embedding matrix is no longer
+    needed in memory, and the search shape matches index.search.
+    """
+
+    INDEX_FILE = "index.faiss"
+    META_FILE = "meta.json"
+
+    def __init__(self, index, embeddings: ReducedPrecisionEmbeddings, rerank_factor: int = 4):
+        self.index = index
+        self.embeddings = embeddings
+        self.rerank_factor = rerank_factor
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @classmethod
+    def build(cls, directory: str, sentence_embeddings: np.ndarray, storage_dtype: str = "float16",
+              index_factory: str = "SQ4", rerank_factor: int = 4) -> "RerankingIndex":
+        """Build the SQ index and reduced-precision vector store in `directory` and open them memory-mapped."""
+        embeddings = np.ascontiguousarray(sentence_embeddings, dtype=np.float32)
+        index = faiss.index_factory(embeddings.shape[1], index_factory, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+        index.add(embeddings)
+
+        os.makedirs(directory, exist_ok=True)
+        faiss.write_index(index, os.path.join(directory, cls.INDEX_FILE))
+        ReducedPrecisionEmbeddings.save(directory, embeddings, dtype=storage_dtype)
+        with open(os.path.join(directory, cls.META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"index_factory": index_factory, "storage_dtype": storage_dtype,
+                       "rerank_factor": rerank_factor}, f, indent=2)
+
+        float32_bytes = embeddings.nbytes
+        stored_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"Stored {len(embeddings)} vectors in {stored_bytes / 1e6:.2f} MB "
+              f"(float32 embeddings alone: {float32_bytes / 1e6:.2f} MB)")
+        return cls.load(directory)
+
+    @classmethod
+    def load(cls, directory: str, rerank_factor: Optional[int] = None) -> "RerankingIndex":
+        with open(os.path.join(directory, cls.META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        index_path = os.path.join(directory, cls.INDEX_FILE)
+        try:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            index = faiss.read_index(index_path)
+        return cls(index, ReducedPrecisionEmbeddings.load(directory), rerank_factor or meta["rerank_factor"])
+
+    def search(self, query_matrix: np.ndarray, k: int):
+        """Approximate candidate search followed by re-ranking on the stored vectors."""
+        queries = np.ascontiguousarray(query_matrix, dtype=np.float32)
+        num_candidates = min(k * self.rerank_factor, self.ntotal)
+        _, candidates = self.index.search(queries, num_candidates)
+
+        valid = candidates >= 0
+        candidate_vectors = self.embeddings.reconstruct(np.where(valid, candidates, 0))
+        scores = np.einsum("qcd,qd->qc", candidate_vectors, queries)
+        scores[~valid] = -np.inf
+
+        top = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        distances = np.take_along_axis(scores, top, axis=1).astype(np.float32)
+        indices = np.take_along_axis(candidates, top, axis=1)
+        if indices.shape[1] < k:
+            pad = k - indices.shape[1]
+            distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=-np.inf)
+            indices = np.pad(indices, ((0, 0), (0, pad)), constant_values=-1)
+        return distances, indices
+
+
+def reranking_recall(reranking_index: RerankingIndex, sentence_embeddings: np.ndarray,
+                     query_matrix: np.ndarray, k: int = 10) -> float:
+    """recall@k of a RerankingIndex against exact float32 search, for checking a storage choice."""
+    exact_index = faiss.IndexFlatIP(sentence_embeddings.shape[1])
+    exact_index.add(np.ascontiguousarray(sentence_embeddings, dtype=np.float32))
+    queries = np.ascontiguousarray(query_matrix, dtype=np.float32)
+    _, ground_truth = exact_index.search(queries, k)
+    _, found = reranking_index.search(queries, k)
+    return _recall_at_k(found, ground_truth)
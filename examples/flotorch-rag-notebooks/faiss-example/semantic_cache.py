@@ -0,0 +1,121 @@
+import time
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import faiss
+from sentence_transformers import SentenceTransformer
+
+
+def context_fingerprint(context: str) -> str:
+    """Hash of the retrieved context, so an answer is only reused for the same evidence."""
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    tokens: Any
+    fingerprint: str
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """Answer cache keyed by query meaning rather than exact text.
+
+    Query embeddings live in a small FAISS inner-product index over
+    normalized vectors, so scores are cosine similarities. A lookup hits
+    when a cached query is at least `threshold` similar, was answered from
+    the same retrieved context and is younger than `ttl_seconds`. The least
+    recently used entry is evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, embedder: SentenceTransformer, threshold: float = 0.92, max_entries: int = 1000,
+                 ttl_seconds: Optional[float] = 3600, candidates: int = 8):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.candidates = candidates
+
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(embedder.get_sentence_embedding_dimension()))
+        self.entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tokens_saved = 0
+
+    def _embed(self, query: str, query_embedding: Optional[np.ndarray] = None) -> np.ndarray:
+        if query_embedding is None:
+            query_embedding = self.embedder.encode(query, convert_to_numpy=True)
+        vector = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _is_expired(self, entry: CachedAnswer) -> bool:
+        return self.ttl_seconds is not None and time.time() - entry.created_at > self.ttl_seconds
+
+    def _evict(self, entry_id: int):
+        self.entries.pop(entry_id, None)
+        self.index.remove_ids(np.array([entry_id], dtype=np.int64))
+        self.evictions += 1
+
+    def lookup(self, query: str, context: str, query_embedding: Optional[np.ndarray] = None) -> Optional[Tuple[str, Any]]:
+        """Return the cached (answer, tokens) for a similar query over the same context, or None."""
+        if self.index.ntotal == 0:
+            self.misses += 1
+            return None
+
+        fingerprint = context_fingerprint(context)
+        scores, ids = self.index.search(self._embed(query, query_embedding), min(self.candidates, self.index.ntotal))
+
+        for score, entry_id in zip(scores[0], ids[0]):
+            if entry_id < 0 or score < self.threshold:
+                break  # results are sorted by similarity
+            entry = self.entries.get(int(entry_id))
+            if entry is None:
+                continue
+            if self._is_expired(entry):
+                self._evict(int(entry_id))
+                continue
+            if entry.fingerprint == fingerprint:
+                self.entries.move_to_end(int(entry_id))
+                self.hits += 1
+                try:
+                    self.tokens_saved += int(entry.tokens)
+                except (TypeError, ValueError):
+                    pass
+                return entry.answer, entry.tokens
+
+        self.misses += 1
+        return None
+
+    def store(self, query: str, context: str, answer: str, tokens: Any, query_embedding: Optional[np.ndarray] = None):
+        """Cache an answer, evicting the least recently used entry when full."""
+        while len(self.entries) >= self.max_entries:
+            oldest_id = next(iter(self.entries))
+            self._evict(oldest_id)
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self.index.add_with_ids(self._embed(query, query_embedding), np.array([entry_id], dtype=np.int64))
+        self.entries[entry_id] = CachedAnswer(answer, tokens, context_fingerprint(context), time.time())
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+            "tokens_saved": self.tokens_saved,
+        }
@@ -0,0 +1,144 @@
+import os
+import json
+import mmap
+from array import array
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils import SentenceRecord
+
+
+class SentenceStoreWriter:
+    """Append sentences to an on-disk store without keeping them in memory.
+
+    Layout of the store directory:
+        sentences.bin  all sentences as one UTF-8 blob
+        offsets.npy    int64 byte offsets, n + 1 entries (sentence i is blob[offsets[i]:offsets[i+1]])
+        pages.npy      int32 page number per sentence (0 when unknown)
+        source_ids.npy int32 index into sources.json per sentence
+        sources.json   list of source PDF names
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._blob = open(os.path.join(directory, SentenceStore.BLOB_FILE), 'wb')
+        self._offsets = array('q', [0])
+        self._pages = array('i')
+        self._source_ids = array('i')
+        self._sources: List[str] = []
+        self._source_lookup = {}
+
+    def add(self, sentence: Union[str, SentenceRecord], source: str = "", page: int = 0):
+        """Append one sentence; SentenceRecords carry their own page number."""
+        if isinstance(sentence, SentenceRecord):
+            sentence, page = sentence.text, sentence.page
+        if source not in self._source_lookup:
+            self._source_lookup[source] = len(self._sources)
+            self._sources.append(source)
+
+        encoded = sentence.encode("utf-8")
+        self._blob.write(encoded)
+        self._offsets.append(self._offsets[-1] + len(encoded))
+        self._pages.append(page)
+        self._source_ids.append(self._source_lookup[source])
+
+    def extend(self, sentences: Iterable[Union[str, SentenceRecord]], source: str = ""):
+        for sentence in sentences:
+            self.add(sentence, source=source)
+
+    def close(self):
+        self._blob.close()
+        np.save(os.path.join(self.directory, SentenceStore.OFFSETS_FILE), np.frombuffer(self._offsets, dtype=np.int64))
+        np.save(os.path.join(self.directory, SentenceStore.PAGES_FILE), np.frombuffer(self._pages, dtype=np.int32))
+        np.save(os.path.join(self.directory, SentenceStore.SOURCE_IDS_FILE), np.frombuffer(self._source_ids, dtype=np.int32))
+        with open(os.path.join(self.directory, SentenceStore.SOURCES_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self._sources, f, ensure_ascii=False)
+
+    def __enter__(self) -> "SentenceStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SentenceStore:
+    """Read-only, memory-mapped sentence table.
+
+    Behaves like the list of sentences used elsewhere in the example
+    (len() and integer indexing), so it can be passed as `sentences` to
+    batch_rag_retrieve and perform_rag_search. Files are mapped read-only,
+    so several worker processes share one copy through the OS page cache.
+    """
+
+    BLOB_FILE = "sentences.bin"
+    OFFSETS_FILE = "offsets.npy"
+    PAGES_FILE = "pages.npy"
+    SOURCE_IDS_FILE = "source_ids.npy"
+    SOURCES_FILE = "sources.json"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.offsets = np.load(os.path.join(directory, self.OFFSETS_FILE), mmap_mode='r')
+        self.pages = np.load(os.path.join(directory, self.PAGES_FILE), mmap_mode='r')
+        self.source_ids = np.load(os.path.join(directory, self.SOURCE_IDS_FILE), mmap_mode='r')
+        with open(os.path.join(directory, self.SOURCES_FILE), 'r', encoding='utf-8') as f:
+            self.sources: List[str] = json.load(f)
+
+        self._blob_file = open(os.path.join(directory, self.BLOB_FILE), 'rb')
+        if os.fstat(self._blob_file.fileno()).st_size:
+            self._blob = mmap.mmap(self._blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._blob = b""  # mmap cannot map an empty file
+        self._view = memoryview(self._blob)
+
+    @classmethod
+    def build(cls, directory: str, sentences: Iterable[Union[str, SentenceRecord]], source: str = "") -> "SentenceStore":
+        """Write sentences (or SentenceRecords) from one source to `directory` and open the result."""
+        with SentenceStoreWriter(directory) as writer:
+            writer.extend(sentences, source=source)
+        return cls(directory)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get_bytes(self, idx: int) -> memoryview:
+        """Zero-copy view of a sentence's UTF-8 bytes.
+
+        The view points into the mapped file: release it (or use bytes(view)) before
+        close(), otherwise the mapping stays open until the view is garbage-collected.
+        """
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f"sentence index {idx} out of range")
+        return self._view[int(self.offsets[idx]):int(self.offsets[idx + 1])]
+
+    def __getitem__(self, idx: int) -> str:
+        return str(self.get_bytes(idx), "utf-8")
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def metadata(self, idx: int) -> Tuple[Optional[str], int]:
+        """(source PDF, page number) for a sentence."""
+        return self.sources[int(self.source_ids[idx])] or None, int(self.pages[idx])
+
+    def close(self):
+        try:
+            self._view.release()
+            if isinstance(self._blob, mmap.mmap):
+                self._blob.close()
+        except BufferError:
+            pass  # views from get_bytes are still held; the map is freed once they are dropped
+        self._view = self._blob = None
+        self._blob_file.close()
+
+    def __enter__(self) -> "SentenceStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
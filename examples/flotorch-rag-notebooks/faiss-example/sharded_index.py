@@ -0,0 +1,198 @@
+import os
+import json
+import hashlib
+import concurrent.futures
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import faiss
+from sentence_transformers import SentenceTransformer
+
+from utils import min_training_points
+
+
+def _stable_hash(value: str) -> int:
+    """Process-independent hash (Python's hash() is salted per run)."""
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "little")
+
+
+class ShardedFaissIndex:
+    """Corpus split across several FAISS indexes that are searched in parallel.
+
+    Sentence IDs are global positions in `sentences`, so the object can be
+    passed anywhere an index is expected, e.g.
+    batch_rag_retrieve(queries, sharded.sentences, sharded, embedder).
+
+    Shards are assigned per document (shard_by="document") or per sentence
+    (shard_by="hash"). FAISS releases the GIL while searching, so a thread
+    pool gives one core per shard.
+
+    Layouts that need training (IVF, PQ) are trained once on a sample drawn
+    across documents and the trained layout is copied into every shard, so all
+    shards share one set of centroids. Vectors are buffered, and searched
+    exactly, until MIN_POINTS_PER_CENTROID points per centroid are available.
+    A corpus too small to train the layout at all is stored in Flat shards.
+    """
+
+    META_FILE = "shards.json"
+    SENTENCES_FILE = "sentences.json"
+    # FAISS warns below ~39 training points per centroid (coarse or PQ codebook)
+    MIN_POINTS_PER_CENTROID = 39
+
+    def __init__(self, dimension: int, num_shards: Optional[int] = None, index_factory: str = "Flat",
+                 shard_by: str = "document", max_workers: Optional[int] = None):
+        if shard_by not in ("document", "hash"):
+            raise ValueError(f"shard_by must be 'document' or 'hash', got {shard_by!r}")
+        self.dimension = dimension
+        self.num_shards = num_shards or os.cpu_count() or 1
+        self.index_factory = index_factory
+        self.shard_by = shard_by
+        self.shards = [self._new_shard() for _ in range(self.num_shards)]
+        self.sentences: List[str] = []
+        self.sentence_docs: List[str] = []
+        # (vectors, ids, shard assignments) waiting for the shared training sample
+        self._pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or self.num_shards)
+
+    def _new_shard(self):
+        return faiss.IndexIDMap2(faiss.index_factory(self.dimension, self.index_factory, faiss.METRIC_INNER_PRODUCT))
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.ntotal for shard in self.shards) + sum(len(ids) for _, ids, _ in self._pending)
+
+    @property
+    def is_trained(self) -> bool:
+        return all(shard.is_trained for shard in self.shards)
+
+    @property
+    def train_size(self) -> int:
+        """Vectors to collect before the shared training (0 for layouts without training)."""
+        if self.is_trained:
+            return 0
+        layout = self.shards[0].index
+        ivf = faiss.try_extract_index_ivf(layout)
+        return max(self.MIN_POINTS_PER_CENTROID * (ivf.nlist if ivf is not None else 256), min_training_points(layout))
+
+    def train(self, sample: np.ndarray):
+        """Train the layout once on a sample and copy it into every (empty) shard.
+
+        Falls back to Flat shards when the sample has fewer vectors than the layout's
+        k-means needs (nlist for IVF, 2**nbits for PQ).
+        """
+        layout = faiss.index_factory(self.dimension, self.index_factory, faiss.METRIC_INNER_PRODUCT)
+        minimum = min_training_points(layout)
+        if len(sample) < minimum:
+            print(f"⚠️ {len(sample)} vectors cannot train {self.index_factory} (needs {minimum}); using Flat shards")
+            self.index_factory = "Flat"
+            layout = faiss.index_factory(self.dimension, self.index_factory, faiss.METRIC_INNER_PRODUCT)
+        print(f"Training {self.index_factory} on {len(sample)} vectors for {self.num_shards} shards...")
+        layout.train(np.ascontiguousarray(sample, dtype=np.float32))
+        self.shards = [faiss.IndexIDMap2(faiss.clone_index(layout)) for _ in range(self.num_shards)]
+
+    def _add_to_shards(self, vectors: np.ndarray, ids: np.ndarray, assignments: np.ndarray):
+        for shard_no in np.unique(assignments):
+            mask = assignments == shard_no
+            self.shards[shard_no].add_with_ids(vectors[mask], ids[mask])
+
+    def _train_pending(self, force: bool = False):
+        """Train on the buffered vectors once enough are collected (or on whatever there is, if forced)."""
+        if not self._pending or (not force and self.ntotal < self.train_size):
+            return
+        self.train(np.concatenate([vectors for vectors, _, _ in self._pending]))
+        for vectors, ids, assignments in self._pending:
+            self._add_to_shards(vectors, ids, assignments)
+        self._pending = []
+
+    def _route(self, doc_id: str, sentences: List[str]) -> np.ndarray:
+        """Shard number for each sentence of a document."""
+        if self.shard_by == "document":
+            return np.full(len(sentences), _stable_hash(doc_id) % self.num_shards)
+        return np.array([_stable_hash(sentence) % self.num_shards for sentence in sentences])
+
+    def add_document(self, doc_id: str, sentences: List[str], sentence_embeddings: np.ndarray):
+        """Add a document's sentences and their embeddings, routed to their shards."""
+        vectors = np.ascontiguousarray(sentence_embeddings, dtype=np.float32)
+        first_id = len(self.sentences)
+        ids = np.arange(first_id, first_id + len(sentences), dtype=np.int64)
+        self.sentences.extend(sentences)
+        self.sentence_docs.extend([doc_id] * len(sentences))
+
+        assignments = self._route(doc_id, sentences)
+        if self.is_trained:
+            self._add_to_shards(vectors, ids, assignments)
+            return
+        self._pending.append((vectors, ids, assignments))
+        self._train_pending()
+
+    def build(self, documents: Dict[str, List[str]], embedder: SentenceTransformer, batch_size: int = 64):
+        """Embed and add several documents, given as {doc_id: sentences}."""
+        for doc_id, sentences in documents.items():
+            if not sentences:
+                continue
+            embeddings = embedder.encode(sentences, batch_size=batch_size, convert_to_numpy=True)
+            self.add_document(doc_id, sentences, embeddings)
+        # A corpus smaller than train_size is trained on all of it
+        self._train_pending(force=True)
+        print(f"Indexed {self.ntotal} sentences across {self.num_shards} shards: "
+              f"{[shard.ntotal for shard in self.shards]}")
+
+    def search(self, query_matrix: np.ndarray, k: int):
+        """Search every shard in parallel and merge into the global top-k by score."""
+        queries = np.ascontiguousarray(query_matrix, dtype=np.float32)
+        if self._pending:
+            # Still collecting the training sample: exact search over the buffered vectors
+            exact = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+            for vectors, ids, _ in self._pending:
+                exact.add_with_ids(vectors, ids)
+            return exact.search(queries, k)
+        shard_results = list(self._executor.map(lambda shard: shard.search(queries, k),
+                                                [shard for shard in self.shards if shard.ntotal > 0]))
+        if not shard_results:
+            return (np.full((len(queries), k), -np.inf, dtype=np.float32),
+                    np.full((len(queries), k), -1, dtype=np.int64))
+
+        distances = np.hstack([d for d, _ in shard_results])
+        indices = np.hstack([i for _, i in shard_results])
+        distances[indices < 0] = -np.inf  # padding from shards with fewer than k vectors
+
+        # Inner product: higher is better
+        top = np.argsort(-distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, top, axis=1), np.take_along_axis(indices, top, axis=1)
+
+    def save(self, directory: str):
+        """Write each shard to its own file plus the global sentence table."""
+        os.makedirs(directory, exist_ok=True)
+        self._train_pending(force=True)
+        for shard_no, shard in enumerate(self.shards):
+            faiss.write_index(shard, os.path.join(directory, f"shard_{shard_no}.faiss"))
+        with open(os.path.join(directory, self.SENTENCES_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"sentences": self.sentences, "documents": self.sentence_docs}, f, ensure_ascii=False)
+        with open(os.path.join(directory, self.META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                "dimension": self.dimension,
+                "num_shards": self.num_shards,
+                "index_factory": self.index_factory,
+                "shard_by": self.shard_by,
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = False, max_workers: Optional[int] = None) -> "ShardedFaissIndex":
+        """Load shards written by save(); with mmap=True shards stay on disk and are paged in on demand."""
+        with open(os.path.join(directory, cls.META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        sharded = cls(meta["dimension"], meta["num_shards"], meta["index_factory"], meta["shard_by"], max_workers)
+
+        io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        for shard_no in range(sharded.num_shards):
+            shard_path = os.path.join(directory, f"shard_{shard_no}.faiss")
+            try:
+                sharded.shards[shard_no] = faiss.read_index(shard_path, io_flags)
+            except RuntimeError:
+                sharded.shards[shard_no] = faiss.read_index(shard_path)
+
+        with open(os.path.join(directory, cls.SENTENCES_FILE), 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        sharded.sentences = table["sentences"]
+        sharded.sentence_docs = table["documents"]
+        return sharded
@@ -1,20 +1,38 @@
 import os
 import random
 import time
+import asyncio
+import functools
+import concurrent.futures
 import json
+import re
 import sys
+import hashlib
+import shutil
+import tempfile
+import zlib
+import weakref
+import httpx
 import requests
-from typing import List
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
+import numpy as np
 import PyPDF2
 from sentence_transformers import SentenceTransformer
 import faiss
-from flotorch.sdk.llm import FlotorchLLM
+
+try:
+    from flotorch.sdk.utils.llm_utils import LLM_ENDPOINT as FLOTORCH_CHAT_ENDPOINT
+except ImportError:  # internal SDK module; the gateway route it held in flotorch 3.x
+    FLOTORCH_CHAT_ENDPOINT = "/openai/v1/chat/completions"
+
+from profiling import profile_stage
 
 
 def extract_text_from_pdf(pdf_path: str) -> str:
     """Extract text content from a PDF file."""
-    text_content = ""
+    page_texts = []
     
     try:
         with open(pdf_path, 'rb') as pdf_file:
@@ -24,11 +42,14 @@ def extract_text_from_pdf(pdf_path: str) -> str:
             print(f"Total pages: {len(pdf_reader.pages)}")
             
             # Extract text from all pages
-            for page_num, page in enumerate(pdf_reader.pages):
-                page_text = page.extract_text()
-                if page_text.strip():  # Only add non-empty pages
-                    text_content += page_text + "\n\n"
-                    
+            with profile_stage("extract", items=len(pdf_reader.pages)):
+                for page_num, page in enumerate(pdf_reader.pages):
+                    page_text = page.extract_text()
+                    if page_text.strip():  # Only add non-empty pages
+                        page_texts.append(page_text + "\n\n")
+            
+            # Join once instead of growing one string page by page
+            text_content = "".join(page_texts)
             print(f"Extracted text length: {len(text_content)} characters")
             
     except FileNotFoundError:
@@ -41,13 +62,16 @@ def extract_text_from_pdf(pdf_path: str) -> str:
     return text_content
 
 
-def split_text_into_sentences(text: str) -> List[str]:
-    """Split text content into sentences for embedding."""
-    sentences = []
+def _iter_sentences_with_offsets(text: str) -> Iterator[Tuple[str, int]]:
+    """Yield (sentence, character offset in text) using the split_text_into_sentences rules."""
+    paragraph_start = 0
     
     # Split by paragraphs first, then by sentences
     for paragraph in text.split("\n\n"):
-        # Clean paragraph
+        offset = paragraph_start + len(paragraph) - len(paragraph.lstrip())
+        paragraph_start += len(paragraph) + 2
+        
+        # Clean paragraph (newline -> space keeps character positions intact)
         paragraph = paragraph.strip().replace("\n", " ")
         if not paragraph:
             continue
@@ -55,34 +79,447 @@ def split_text_into_sentences(text: str) -> List[str]:
         # Simple sentence splitting (can be improved with nltk or spacy)
         current_sentences = paragraph.split(". ")
         for i, sentence in enumerate(current_sentences):
+            sentence_offset = offset + len(sentence) - len(sentence.lstrip())
+            offset += len(sentence) + 2
             sentence = sentence.strip()
             if sentence:
                 # Add period back except for last sentence
                 if i < len(current_sentences) - 1 and not sentence.endswith("."):
                     sentence += "."
-                sentences.append(sentence)
-    
+                yield sentence, sentence_offset
+
+
+def split_text_into_sentences(text: str) -> List[str]:
+    """Split text content into sentences for embedding."""
     # Filter out very short sentences
-    sentences = [s for s in sentences if len(s) > 30]
+    with profile_stage("segment") as stage:
+        sentences = [s for s, _ in _iter_sentences_with_offsets(text) if len(s) > 30]
+        stage.items = len(sentences)
     
     print(f"Extracted {len(sentences)} sentences from PDF")
     return sentences
 
 
-def create_faiss_index(sentences: List[str], embedder: SentenceTransformer):
-    """Create and train FAISS index with sentence embeddings."""
+class SentenceRecord(NamedTuple):
+    """A sentence with its provenance in the source PDF (1-based page, character offset in the page)."""
+    text: str
+    page: int
+    offset: int
+
+
+def _extract_page_range(task: Tuple[str, int, int]) -> List[Tuple[int, str]]:
+    """Process-pool worker: extract pages [start, end) of a PDF as (page number, text) pairs."""
+    pdf_path, start, end = task
+    with open(pdf_path, 'rb') as pdf_file:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        return [(page_num + 1, pdf_reader.pages[page_num].extract_text() or "") for page_num in range(start, end)]
+
+
+def iter_pdf_pages(pdf_path: str, num_processes: Optional[int] = None, pages_per_task: int = 8) -> Iterator[Tuple[int, str]]:
+    """Yield (page number, text) in page order, extracting page ranges in parallel worker processes.
+    
+    At most two tasks per worker are in flight, so memory is bounded by the look-ahead, not the page count.
+    """
+    with open(pdf_path, 'rb') as pdf_file:
+        num_pages = len(PyPDF2.PdfReader(pdf_file).pages)
+    print(f"Streaming {num_pages} pages from {pdf_path}")
+    
+    tasks = [(pdf_path, start, min(start + pages_per_task, num_pages)) for start in range(0, num_pages, pages_per_task)]
+    num_processes = min(num_processes or os.cpu_count() or 1, max(1, len(tasks)))
+    if num_processes == 1:
+        for task in tasks:
+            yield from _extract_page_range(task)
+        return
+    
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_processes) as executor:
+        pending = []
+        task_iter = iter(tasks)
+        for task in task_iter:
+            pending.append(executor.submit(_extract_page_range, task))
+            if len(pending) >= 2 * num_processes:
+                break
+        while pending:
+            pages = pending.pop(0).result()
+            next_task = next(task_iter, None)
+            if next_task is not None:
+                pending.append(executor.submit(_extract_page_range, next_task))
+            yield from pages
+
+
+def iter_pdf_sentences(pdf_path: str, num_processes: Optional[int] = None, min_length: int = 30) -> Iterator[SentenceRecord]:
+    """Stream sentences of a PDF page by page with (page, offset) provenance."""
+    for page_num, page_text in iter_pdf_pages(pdf_path, num_processes=num_processes):
+        for sentence, offset in _iter_sentences_with_offsets(page_text):
+            if len(sentence) > min_length:
+                yield SentenceRecord(sentence, page_num, offset)
+
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[list]:
+    """Group an iterable into lists of at most batch_size items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@dataclass
+class DedupResult:
+    """Sentences left after near-duplicate removal, with back-references to the original positions."""
+    sentences: List[str]
+    source_ids: List[List[int]]  # original sentence indices collapsed into each kept sentence
+    num_input: int
+    
+    @property
+    def duplicates_removed(self) -> int:
+        return self.num_input - len(self.sentences)
+
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def _shingle_hashes(sentence: str, shingle_size: int, ignore_numbers: bool = False) -> np.ndarray:
+    """32-bit hashes of the word n-grams of a sentence; empty when it has no words."""
+    words = re.findall(r"\w+", sentence.lower())
+    if ignore_numbers:
+        words = [w for w in words if not w.isdigit()]
+    if not words:
+        return np.array([], dtype=np.uint64)
+    if len(words) <= shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    return np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64)
+
+
+def _trapezoid_area(y: np.ndarray, x: np.ndarray) -> float:
+    return float(((y[1:] + y[:-1]) * np.diff(x)).sum() / 2)
+
+
+@functools.lru_cache(maxsize=None)
+def _lsh_bands(num_perm: int, threshold: float, false_negative_weight: float = 0.9) -> Tuple[int, int]:
+    """(bands, rows) minimising the weighted false-positive and false-negative areas of the LSH S-curve.
+    
+    A pair with Jaccard s becomes a candidate with probability 1 - (1 - s^r)^b. As in datasketch,
+    the false-positive area is that probability integrated over [0, threshold] and the false-negative
+    area its complement over [threshold, 1]. Missed pairs are weighted heavily because every candidate
+    is re-checked against the full signature, so false positives only cost time.
+    """
+    below = np.linspace(0.0, threshold, 201)
+    above = np.linspace(threshold, 1.0, 201)
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_positive = _trapezoid_area(1 - (1 - below ** rows) ** bands, below)
+            false_negative = _trapezoid_area((1 - above ** rows) ** bands, above)
+            error = (1 - false_negative_weight) * false_positive + false_negative_weight * false_negative
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+def deduplicate_sentences(sentences: List[str], threshold: float = 0.8, num_perm: int = 128,
+                          shingle_size: int = 3, ignore_numbers: bool = False, seed: int = 1) -> DedupResult:
+    """Collapse near-duplicate sentences (estimated word-shingle Jaccard >= threshold) using MinHash LSH.
+    
+    The first occurrence of each group is kept; source_ids lists every original index it stands for.
+    ignore_numbers drops standalone numbers before shingling, so headers and footers that only
+    differ by page number collapse; leave it off when numbers (part numbers, limits) matter.
+    Sentences without any word to shingle (e.g. only punctuation) are always kept.
+    """
+    if not sentences:
+        return DedupResult([], [], 0)
+    
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    
+    signatures = np.empty((len(sentences), num_perm), dtype=np.uint64)
+    shingled = []  # sentences with at least one shingle; the rest never match anything
+    with np.errstate(over="ignore"):  # uint64 wrap-around is part of the hash family
+        for i, sentence in enumerate(sentences):
+            hashes = _shingle_hashes(sentence, shingle_size, ignore_numbers)[:, None]
+            if len(hashes):
+                signatures[i] = (((hashes * a + b) % _MERSENNE_PRIME) & _MAX_HASH).min(axis=0)
+                shingled.append(i)
+    
+    # Union-find over candidate pairs that share an LSH bucket and pass the estimated-Jaccard check
+    parent = list(range(len(sentences)))
+    
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    bands, rows = _lsh_bands(num_perm, threshold)
+    for band in range(bands):
+        buckets = {}
+        band_slice = signatures[:, band * rows:(band + 1) * rows]
+        for i in shingled:
+            buckets.setdefault(band_slice[i].tobytes(), []).append(i)
+        for members in buckets.values():
+            # Check each member against every earlier one, so a pair is found even when
+            # the bucket's first member does not match either of them
+            for position in range(1, len(members)):
+                other = members[position]
+                earlier = members[:position]
+                similar = np.mean(signatures[earlier] == signatures[other], axis=1) >= threshold
+                for candidate in np.asarray(earlier)[similar]:
+                    root_candidate, root_other = find(int(candidate)), find(other)
+                    if root_candidate != root_other:
+                        # Keep the earliest sentence as the group representative
+                        parent[max(root_candidate, root_other)] = min(root_candidate, root_other)
+    
+    groups = {}
+    for i in range(len(sentences)):
+        groups.setdefault(find(i), []).append(i)
+    representatives = sorted(groups)
+    
+    return DedupResult(
+        sentences=[sentences[root] for root in representatives],
+        source_ids=[groups[root] for root in representatives],
+        num_input=len(sentences),
+    )
+
+
+# Upper token-length bound of each embedding bucket; longer sentences are truncated by the model anyway
+LENGTH_BUCKETS = (16, 32, 64, 128, 256, 512)
+TOKENS_PER_BATCH = 8192
+# Thread-count variables read by torch/MKL/OpenMP when a pool worker starts
+WORKER_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def _token_lengths(sentences: List[str], embedder: SentenceTransformer) -> np.ndarray:
+    """Token count per sentence from the embedder's tokenizer, or a character estimate without one."""
+    tokenizer = getattr(embedder, "tokenizer", None)
+    if tokenizer is None:
+        return np.array([len(sentence) // 4 + 2 for sentence in sentences])
+    input_ids = tokenizer(sentences, add_special_tokens=True, truncation=True,
+                          max_length=getattr(embedder, "max_seq_length", None) or 512)["input_ids"]
+    return np.array([len(ids) for ids in input_ids])
+
+
+def _start_cpu_pool(embedder: SentenceTransformer, num_processes: int):
+    """Start a CPU process pool whose workers split the cores instead of each using all of them."""
+    threads = str(max(1, (os.cpu_count() or 1) // num_processes))
+    saved = {name: os.environ.get(name) for name in WORKER_THREAD_ENV_VARS}
+    os.environ.update({name: threads for name in WORKER_THREAD_ENV_VARS})
+    try:
+        return embedder.start_multi_process_pool(target_devices=["cpu"] * num_processes)
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def encode_sentences(sentences: List[str], embedder: SentenceTransformer, num_processes: int = 1,
+                     tokens_per_batch: int = TOKENS_PER_BATCH, verbose: bool = True) -> np.ndarray:
+    """Embed sentences in token-length buckets, each with its own batch size, optionally over a process pool.
+    
+    Short sentences get large batches and long ones small batches, so each batch carries
+    roughly `tokens_per_batch` tokens with little padding. A single process already uses
+    every core through torch's intra-op threads, so the CPU process pool is opt-in: pass
+    num_processes > 1 after measuring that it helps on the host (scripts then need an
+    `if __name__ == "__main__":` guard, as the pool spawns processes). Pool workers get
+    cpu_count // num_processes threads each. Vectors are returned in the original sentence order.
+    """
+    if not sentences:
+        return np.zeros((0, embedder.get_sentence_embedding_dimension()), dtype=np.float32)
+    
+    with profile_stage("tokenize", items=len(sentences)):
+        lengths = _token_lengths(sentences, embedder)
+    bucket_ids = np.searchsorted(LENGTH_BUCKETS, lengths)
+    
+    # Embedders without a multi-process pool (e.g. ONNX Runtime) already use all cores per call
+    use_pool = num_processes > 1 and hasattr(embedder, "start_multi_process_pool")
+    pool = _start_cpu_pool(embedder, num_processes) if use_pool else None
+    sentence_embeddings = None
+    try:
+        with profile_stage("encode", items=len(sentences), tokens=int(lengths.sum())):
+            sentence_embeddings = _encode_buckets(sentences, embedder, bucket_ids, pool, tokens_per_batch, verbose)
+    finally:
+        if pool is not None:
+            embedder.stop_multi_process_pool(pool)
+    
+    return sentence_embeddings
+
+
+def _encode_buckets(sentences: List[str], embedder: SentenceTransformer, bucket_ids: np.ndarray, pool,
+                    tokens_per_batch: int, verbose: bool) -> np.ndarray:
+    """Encode each length bucket with its own batch size and scatter the vectors back into input order."""
+    sentence_embeddings = None
+    for bucket_id in np.unique(bucket_ids):
+        positions = np.flatnonzero(bucket_ids == bucket_id)
+        max_length = LENGTH_BUCKETS[min(bucket_id, len(LENGTH_BUCKETS) - 1)]
+        batch_size = int(np.clip(tokens_per_batch // max_length, 8, 512))
+        bucket_sentences = [sentences[i] for i in positions]
+        
+        if pool is not None:
+            vectors = embedder.encode_multi_process(bucket_sentences, pool, batch_size=batch_size)
+        else:
+            vectors = embedder.encode(bucket_sentences, batch_size=batch_size, convert_to_numpy=True)
+        
+        if sentence_embeddings is None:
+            sentence_embeddings = np.empty((len(sentences), vectors.shape[1]), dtype=np.float32)
+        sentence_embeddings[positions] = vectors
+        if verbose:
+            print(f"  bucket <= {max_length} tokens: {len(positions)} sentences, batch size {batch_size}")
+    
+    return sentence_embeddings
+
+
+def _faiss_index_size_bytes(index) -> int:
+    """Approximate resident size of an index by its serialized length."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def _recall_at_k(found: np.ndarray, ground_truth: np.ndarray) -> float:
+    """Mean fraction of the exact top-k neighbours that the approximate search returned."""
+    k = ground_truth.shape[1]
+    hits = sum(len(set(f[f >= 0]) & set(g)) for f, g in zip(found, ground_truth))
+    return hits / float(k * len(ground_truth))
+
+
+def faiss_tuning_candidates(num_vectors: int, dimension: int) -> List[Tuple[str, dict]]:
+    """List (index_factory, search_params) pairs worth benchmarking for a corpus of this size."""
+    candidates = [("Flat", {})]
+    candidates += [("HNSW32", {"efSearch": ef}) for ef in (16, 32, 64, 128)]
+    
+    # Keep at least ~39 training points per coarse centroid, as FAISS recommends
+    max_nlist = num_vectors // 39
+    if max_nlist < 4:
+        return candidates
+    base_nlist = min(int(4 * np.sqrt(num_vectors)), max_nlist)
+    nlists = sorted({max(4, base_nlist // 4), base_nlist, min(base_nlist * 4, max_nlist)})
+    
+    for nlist in nlists:
+        nprobes = [p for p in (1, 4, 8, 16, 32, 64) if p <= nlist]
+        candidates += [(f"IVF{nlist},Flat", {"nprobe": p}) for p in nprobes]
+    
+    # PQ codebooks need a few thousand training points; "np" skips polysemous training
+    if num_vectors >= 256 * 8:
+        nprobes = [p for p in (4, 16, 64) if p <= base_nlist]
+        for m in (8, 16, 32):
+            if m <= dimension and dimension % m == 0:
+                candidates += [(f"IVF{base_nlist},PQ{m}x8np", {"nprobe": p}) for p in nprobes]
+    
+    return candidates
+
+
+def tune_faiss_index(sentence_embeddings: np.ndarray, k: int = 10, target_recall: float = 0.95,
+                     num_queries: int = 200, candidates: Optional[List[Tuple[str, dict]]] = None,
+                     seed: int = 42) -> Tuple[dict, List[dict]]:
+    """Benchmark candidate index configs against exact search and pick the fastest that meets target recall@k.
+    
+    Returns the chosen config and a report row (build time, memory, QPS, recall) for every candidate.
+    """
+    embeddings = np.ascontiguousarray(sentence_embeddings, dtype=np.float32)
+    num_vectors, dimension = embeddings.shape
+    
+    # Hold out sample queries so they are not trivially their own nearest neighbour
+    rng = np.random.default_rng(seed)
+    num_queries = min(num_queries, max(1, num_vectors // 10))
+    query_ids = rng.choice(num_vectors, size=num_queries, replace=False)
+    mask = np.ones(num_vectors, dtype=bool)
+    mask[query_ids] = False
+    queries, database = embeddings[query_ids], embeddings[mask]
+    k = min(k, len(database))
+    
+    exact_index = faiss.IndexFlatIP(dimension)
+    exact_index.add(database)
+    _, ground_truth = exact_index.search(queries, k)
+    
+    if candidates is None:
+        candidates = faiss_tuning_candidates(len(database), dimension)
+    
+    parameter_space = faiss.ParameterSpace()
+    built = {}
+    report = []
+    
+    for index_factory, search_params in candidates:
+        if index_factory not in built:
+            start = time.perf_counter()
+            index = faiss.index_factory(dimension, index_factory, faiss.METRIC_INNER_PRODUCT)
+            index.train(database)
+            index.add(database)
+            built[index_factory] = (index, time.perf_counter() - start, _faiss_index_size_bytes(index))
+        index, build_seconds, memory_bytes = built[index_factory]
+        
+        for name, value in search_params.items():
+            parameter_space.set_index_parameter(index, name, value)
+        
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        search_seconds = time.perf_counter() - start
+        
+        report.append({
+            "index_factory": index_factory,
+            "search_params": dict(search_params),
+            "build_seconds": build_seconds,
+            "memory_bytes": memory_bytes,
+            "qps": num_queries / max(search_seconds, 1e-9),
+            "recall_at_k": _recall_at_k(found, ground_truth),
+        })
+    
+    eligible = [row for row in report if row["recall_at_k"] >= target_recall]
+    if eligible:
+        best = max(eligible, key=lambda row: row["qps"])
+    else:
+        print(f"⚠️ No candidate reached recall@{k} >= {target_recall}; using the most accurate one")
+        best = max(report, key=lambda row: (row["recall_at_k"], row["qps"]))
+    
+    return best, report
+
+
+def print_tuning_report(report: List[dict], best: Optional[dict] = None):
+    """Print the tuning report as a table, marking the selected config."""
+    print(f"{'index':<20} {'params':<16} {'build s':>8} {'memory MB':>10} {'QPS':>10} {'recall':>7}")
+    print("-" * 76)
+    for row in report:
+        params = ",".join(f"{name}={value}" for name, value in row["search_params"].items()) or "-"
+        marker = " <- selected" if row is best else ""
+        print(f"{row['index_factory']:<20} {params:<16} {row['build_seconds']:>8.3f} "
+              f"{row['memory_bytes'] / 1e6:>10.2f} {row['qps']:>10.0f} {row['recall_at_k']:>7.3f}{marker}")
+
+
+def create_faiss_index(sentences: List[str], embedder: SentenceTransformer, index_factory: Optional[str] = None,
+                       target_recall: Optional[float] = None, k: int = 10, num_processes: int = 1):
+    """Create and train FAISS index with sentence embeddings.
+    
+    With target_recall set, candidate index configs are benchmarked first and the
+    fastest one reaching that recall@k against exact search is used.
+    """
     
     # Generate embeddings for all sentences
     print("Generating embeddings for sentences...")
-    sentence_embeddings = embedder.encode(sentences, convert_to_numpy=True)
+    sentence_embeddings = encode_sentences(sentences, embedder, num_processes=num_processes)
     print(f"Embeddings shape: {sentence_embeddings.shape}")
     
     # FAISS index configuration
     dimension = sentence_embeddings.shape[1]  # Embedding dimension
     num_vectors = sentence_embeddings.shape[0]  # Number of sentences
     
+    search_params = {}
+    if target_recall is not None and index_factory is None:
+        print(f"Tuning index for recall@{k} >= {target_recall}...")
+        best, report = tune_faiss_index(sentence_embeddings, k=k, target_recall=target_recall)
+        print_tuning_report(report, best)
+        index_factory = best["index_factory"]
+        search_params = best["search_params"]
+    
     # Create the index
-    if num_vectors < 100:
+    if index_factory is not None:
+        # Caller-selected index layout, scored by inner product like IndexFlatIP
+        index = faiss.index_factory(dimension, index_factory, faiss.METRIC_INNER_PRODUCT)
+        print(f"Using {index_factory}")
+    elif num_vectors < 100:
         # Use simpler index for small datasets
         index = faiss.IndexFlatIP(dimension)  # Inner product (cosine similarity)
         print("Using IndexFlatIP for small dataset")
@@ -98,28 +535,474 @@ def create_faiss_index(sentences: List[str], embedder: SentenceTransformer):
     
     print("Training index...")
     if hasattr(index, 'train'):
-        index.train(sentence_embeddings)
+        with profile_stage("train", items=num_vectors):
+            index.train(sentence_embeddings)
         
     print("Adding vectors to index...")
-    index.add(sentence_embeddings)
+    with profile_stage("add", items=num_vectors):
+        index.add(sentence_embeddings)
+    
+    parameter_space = faiss.ParameterSpace()
+    for name, value in search_params.items():
+        parameter_space.set_index_parameter(index, name, value)
     
     print(f"Index is trained: {getattr(index, 'is_trained', True)}")
     print(f"Number of vectors in index: {index.ntotal}")
     
     return index, sentence_embeddings
 
+
+def min_training_points(index) -> int:
+    """Fewest vectors FAISS can train a layout on: one per k-means centroid (IVF lists, PQ codewords)."""
+    if index.is_trained:
+        return 0
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexPreTransform):
+        index = faiss.downcast_index(index.index)
+    ivf = faiss.try_extract_index_ivf(index)
+    pq = getattr(index, "pq", None)
+    return max(ivf.nlist if ivf is not None else 1, pq.ksub if pq is not None else 1)
+
+
+def create_faiss_index_streaming(pdf_path: str, embedder: SentenceTransformer, index_factory: str = "Flat",
+                                 batch_size: int = 1024, train_size: Optional[int] = None,
+                                 num_processes: Optional[int] = None,
+                                 sink: Optional[Callable[[List[SentenceRecord]], None]] = None
+                                 ) -> Tuple[object, Optional[List[SentenceRecord]]]:
+    """Build an index from a PDF without holding the embedding matrix in memory.
+    
+    Pages are extracted in parallel, segmented as they arrive and embedded in batches of
+    `batch_size` sentences. Indexes that need training (IVF, PQ) buffer the first
+    `train_size` vectors to train on; a PDF with fewer sentences than the layout's k-means
+    needs gets an exact Flat index instead. Returns the index and the SentenceRecord list,
+    whose position matches the vector id.
+    
+    With a `sink`, each batch of records is handed to it right after embedding and no
+    record list is kept (None is returned in its place), e.g.
+    sink=functools.partial(writer.extend, source=pdf_path) for a SentenceStoreWriter.
+    """
+    records: Optional[List[SentenceRecord]] = [] if sink is None else None
+    embedded = 0
+    index = None
+    untrained_buffer = []
+    buffered = 0
+    
+    for batch in iter_batches(iter_pdf_sentences(pdf_path, num_processes=num_processes), batch_size):
+        vectors = np.ascontiguousarray(encode_sentences([r.text for r in batch], embedder, num_processes=1, verbose=False),
+                                       dtype=np.float32)
+        if sink is None:
+            records.extend(batch)
+        else:
+            sink(batch)
+        embedded += len(batch)
+        print(f"Embedded {embedded} sentences...", end="\r")
+        
+        if index is None:
+            index = faiss.index_factory(vectors.shape[1], index_factory, faiss.METRIC_INNER_PRODUCT)
+            if train_size is None:
+                ivf_lists = getattr(faiss.try_extract_index_ivf(index), "nlist", 0)
+                train_size = max(batch_size, 39 * ivf_lists)
+            train_size = max(train_size, min_training_points(index))
+        
+        if index.is_trained:
+            with profile_stage("add", items=len(vectors)):
+                index.add(vectors)
+            continue
+        
+        untrained_buffer.append(vectors)
+        buffered += len(vectors)
+        if buffered >= train_size:
+            training_vectors = np.concatenate(untrained_buffer)
+            print(f"Training {index_factory} on {len(training_vectors)} vectors...")
+            with profile_stage("train", items=len(training_vectors)):
+                index.train(training_vectors)
+            with profile_stage("add", items=len(training_vectors)):
+                index.add(training_vectors)
+            untrained_buffer = []
+    
+    if index is None:
+        raise ValueError(f"No sentences extracted from PDF: {pdf_path}")
+    if untrained_buffer:
+        # Small document: train on everything collected, or search it exactly if that is too little
+        training_vectors = np.concatenate(untrained_buffer)
+        minimum = min_training_points(index)
+        if len(training_vectors) < minimum:
+            print(f"\n⚠️ {len(training_vectors)} sentences cannot train {index_factory} (needs {minimum}); using Flat")
+            index = faiss.index_factory(training_vectors.shape[1], "Flat", faiss.METRIC_INNER_PRODUCT)
+        with profile_stage("train", items=len(training_vectors)):
+            index.train(training_vectors)
+        with profile_stage("add", items=len(training_vectors)):
+            index.add(training_vectors)
+    
+    print(f"\nNumber of vectors in index: {index.ntotal}")
+    return index, records
+
+
+def create_deduplicated_faiss_index(sentences: List[str], embedder: SentenceTransformer, threshold: float = 0.8,
+                                    ignore_numbers: bool = False, **index_options) -> Tuple[object, np.ndarray, DedupResult]:
+    """Remove near-duplicate sentences, then build the index over the unique ones.
+    
+    Vector ids refer to positions in dedup.sentences; dedup.source_ids maps them back to the input.
+    Prints the estimated embedding time and index memory saved by not indexing the duplicates.
+    """
+    start = time.perf_counter()
+    dedup = deduplicate_sentences(sentences, threshold=threshold, ignore_numbers=ignore_numbers)
+    dedup_seconds = time.perf_counter() - start
+    print(f"Deduplicated {dedup.num_input} -> {len(dedup.sentences)} sentences in {dedup_seconds:.2f}s")
+    
+    start = time.perf_counter()
+    index, sentence_embeddings = create_faiss_index(dedup.sentences, embedder, **index_options)
+    build_seconds = time.perf_counter() - start
+    
+    if dedup.sentences:
+        removed = dedup.duplicates_removed
+        seconds_per_sentence = build_seconds / len(dedup.sentences)
+        bytes_per_vector = (_faiss_index_size_bytes(index) + sentence_embeddings.nbytes) / len(dedup.sentences)
+        print(f"🧹 Skipped {removed} duplicates ({removed / dedup.num_input:.0%}): "
+              f"~{removed * seconds_per_sentence - dedup_seconds:.2f}s embedding/indexing time and "
+              f"~{removed * bytes_per_vector / 1e6:.2f} MB of index + embeddings saved")
+    
+    return index, sentence_embeddings, dedup
+
+
+INDEX_CACHE_DIR = ".faiss_cache"
+
+
+def _hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def index_cache_key(pdf_path: str, model_name: str, index_factory: Optional[str] = None) -> str:
+    """Build the cache key from the PDF content hash, embedder model name and index factory string."""
+    key_source = "|".join([_hash_file(pdf_path), model_name, index_factory or "auto"])
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()[:32]
+
+
+def save_index_cache(cache_path: str, index, sentences: List[str], sentence_embeddings: np.ndarray, metadata: dict):
+    """Write index, sentence table and embeddings to a cache directory in one atomic rename."""
+    parent_dir = os.path.dirname(os.path.abspath(cache_path))
+    os.makedirs(parent_dir, exist_ok=True)
+    staging_path = tempfile.mkdtemp(prefix=".staging-", dir=parent_dir)
+    
+    try:
+        faiss.write_index(index, os.path.join(staging_path, "index.faiss"))
+        np.save(os.path.join(staging_path, "embeddings.npy"), np.ascontiguousarray(sentence_embeddings, dtype=np.float32))
+        with open(os.path.join(staging_path, "sentences.json"), 'w', encoding='utf-8') as f:
+            json.dump(sentences, f, ensure_ascii=False)
+        # meta.json is written last and marks the entry as complete
+        with open(os.path.join(staging_path, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2)
+        
+        if os.path.isdir(cache_path):
+            shutil.rmtree(cache_path)
+        os.replace(staging_path, cache_path)
+    except Exception:
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
+
+
+def load_index_cache(cache_path: str, mmap: bool = True) -> Optional[Tuple[object, List[str], np.ndarray]]:
+    """Load a cached index, sentence table and embeddings, or return None if the entry is missing."""
+    if not os.path.isfile(os.path.join(cache_path, "meta.json")):
+        return None
+    
+    index_path = os.path.join(cache_path, "index.faiss")
+    if mmap:
+        try:
+            # Memory-mapped reads share pages with the OS cache instead of copying the index into RAM
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            # Not every index type supports mmap; fall back to a regular read
+            index = faiss.read_index(index_path)
+    else:
+        index = faiss.read_index(index_path)
+    
+    sentence_embeddings = np.load(os.path.join(cache_path, "embeddings.npy"), mmap_mode='r' if mmap else None)
+    with open(os.path.join(cache_path, "sentences.json"), 'r', encoding='utf-8') as f:
+        sentences = json.load(f)
+    
+    return index, sentences, sentence_embeddings
+
+
+def load_or_build_faiss_index(pdf_path: str, embedder: SentenceTransformer, model_name: str,
+                              index_factory: Optional[str] = None, cache_dir: str = INDEX_CACHE_DIR,
+                              mmap: bool = True, target_recall: Optional[float] = None) -> tuple:
+    """Return (sentences, index, embeddings) for a PDF, reusing the on-disk cache when the PDF is unchanged.
+    
+    Indexes loaded with mmap are read-only; pass mmap=False to add vectors afterwards.
+    Embedders with a `cache_name` (e.g. OnnxEmbedder) are cached under that name instead
+    of model_name, so quantized and float32 vectors never share a cache entry.
+    """
+    model_name = getattr(embedder, "cache_name", model_name)
+    if index_factory is None and target_recall is not None:
+        cache_factory = f"tuned@{target_recall}"
+    else:
+        cache_factory = index_factory
+    cache_key = index_cache_key(pdf_path, model_name, cache_factory)
+    cache_path = os.path.join(cache_dir, cache_key)
+    
+    cached = load_index_cache(cache_path, mmap=mmap)
+    if cached is not None:
+        index, sentences, sentence_embeddings = cached
+        print(f"✅ Loaded cached index {cache_key} ({index.ntotal} vectors)")
+        return sentences, index, sentence_embeddings
+    
+    print(f"🔄 No cached index for {pdf_path}, building a new one...")
+    text_content = extract_text_from_pdf(pdf_path)
+    sentences = split_text_into_sentences(text_content)
+    if not sentences:
+        raise ValueError(f"No sentences extracted from PDF: {pdf_path}")
+    index, sentence_embeddings = create_faiss_index(sentences, embedder, index_factory=index_factory,
+                                                    target_recall=target_recall)
+    
+    metadata = {
+        "pdf_path": os.path.abspath(pdf_path),
+        "model_name": model_name,
+        "index_factory": cache_factory or "auto",
+        "num_sentences": len(sentences),
+        "dimension": int(sentence_embeddings.shape[1]),
+        "created_at": time.time(),
+    }
+    save_index_cache(cache_path, index, sentences, sentence_embeddings, metadata)
+    print(f"💾 Cached index as {cache_key}")
+    
+    return sentences, index, sentence_embeddings
+
+
+@dataclass
+class RetrievalResult:
+    """Retrieved sentences for a single query, ready for the LLM step.
+    
+    `embedding` is the query vector used for the search, kept so later steps such as the
+    semantic answer cache do not encode the query again.
+    """
+    query: str
+    ids: List[int] = field(default_factory=list)
+    scores: List[float] = field(default_factory=list)
+    sentences: List[str] = field(default_factory=list)
+    embedding: Optional[np.ndarray] = None
+
+    @property
+    def context(self) -> str:
+        """Retrieved sentences joined into a prompt context block."""
+        return "".join(sentence + "\n" for sentence in self.sentences)
+
+
+def batch_rag_retrieve(query_texts: List[str], sentences: List[str], index, embedder: SentenceTransformer,
+                       k: int = 3, batch_size: int = 64) -> List[RetrievalResult]:
+    """Embed all queries in one encode call and search the index with a single query matrix."""
+    if not query_texts:
+        return []
+
+    with profile_stage("query_encode", items=len(query_texts)):
+        query_embeddings = embedder.encode(query_texts, batch_size=batch_size, convert_to_numpy=True)
+    query_embeddings = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+    with profile_stage("search", items=len(query_texts)):
+        distances, indices = index.search(query_embeddings, k)
+
+    results = []
+    for query_text, query_embedding, row_distances, row_indices in zip(query_texts, query_embeddings, distances, indices):
+        result = RetrievalResult(query=query_text, embedding=query_embedding)
+        for score, idx in zip(row_distances, row_indices):
+            # FAISS pads with -1 when fewer than k neighbours are found
+            if 0 <= idx < len(sentences):
+                result.ids.append(int(idx))
+                result.scores.append(float(score))
+                result.sentences.append(sentences[idx])
+        results.append(result)
+
+    return results
+
+
+def make_token_counter(embedder: Optional[SentenceTransformer] = None) -> Callable[[str], int]:
+    """Token counter backed by the embedder's local tokenizer, or a ~4 characters/token estimate."""
+    tokenizer = getattr(embedder, "tokenizer", None)
+    if tokenizer is None:
+        return lambda text: (len(text) + 3) // 4
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+
+@dataclass
+class PackedContext:
+    """Context selected for one query under a token budget."""
+    context: str
+    ids: List[int]
+    tokens_used: int
+    tokens_before: int
+    duplicates_removed: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_used
+
+
+def _sentence_words(sentence: str) -> set:
+    """Lower-cased word set, ignoring punctuation and spacing."""
+    return set(re.findall(r"\w+", sentence.lower()))
+
+
+def _word_jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def pack_context(result: RetrievalResult, token_budget: int, count_tokens: Callable[[str], int],
+                 pages: Optional[Sequence[int]] = None, near_duplicate_threshold: float = 0.85) -> PackedContext:
+    """Deduplicate retrieved sentences, fill a token budget in score order and merge page neighbours.
+    
+    Repeated ids, and sentences whose word set (ignoring case and punctuation) has a Jaccard
+    similarity at or above the threshold with a higher-scoring one, are dropped. Remaining sentences are taken in
+    score order while they fit in `token_budget`. Selected sentences with consecutive ids on the same
+    page (`pages[id]`, if given) are joined into one passage.
+    """
+    kept = []
+    seen_ids = set()
+    seen_words = []
+    duplicates_removed = 0
+    for sentence_id, score, sentence in zip(result.ids, result.scores, result.sentences):
+        words = _sentence_words(sentence)
+        if sentence_id in seen_ids or any(_word_jaccard(words, other) >= near_duplicate_threshold for other in seen_words):
+            duplicates_removed += 1
+            continue
+        seen_ids.add(sentence_id)
+        seen_words.append(words)
+        kept.append((sentence_id, score, sentence))
+    
+    selected = []
+    budget_left = token_budget
+    for sentence_id, score, sentence in kept:
+        cost = count_tokens(sentence) + 1  # separator
+        if cost <= budget_left:
+            selected.append((sentence_id, score, sentence))
+            budget_left -= cost
+    
+    # Group consecutive ids from the same page into passages, ordered by their best score
+    passages = []
+    for sentence_id, score, sentence in sorted(selected):
+        if passages:
+            last = passages[-1]
+            same_page = pages is None or pages[last["ids"][-1]] == pages[sentence_id]
+            if sentence_id == last["ids"][-1] + 1 and same_page:
+                last["ids"].append(sentence_id)
+                last["text"] += " " + sentence
+                last["score"] = max(last["score"], score)
+                continue
+        passages.append({"ids": [sentence_id], "text": sentence, "score": score})
+    passages.sort(key=lambda passage: -passage["score"])
+    
+    context = "".join(passage["text"] + "\n" for passage in passages)
+    return PackedContext(
+        context=context,
+        ids=[sentence_id for passage in passages for sentence_id in passage["ids"]],
+        tokens_used=count_tokens(context) if context else 0,
+        tokens_before=count_tokens(result.context) if result.sentences else 0,
+        duplicates_removed=duplicates_removed,
+    )
+
+
+FLOTORCH_MAX_CONNECTIONS = 32
+FLOTORCH_TIMEOUT = 60.0
+
+
+@dataclass
+class LLMReply:
+    """Completion text plus token metadata, in the same shape as the SDK's LLMResponse."""
+    content: str
+    metadata: dict
+
+
+class PooledFlotorchLLM:
+    """FloTorch gateway client that keeps its HTTP connections open between calls.
+    
+    FlotorchLLM (flotorch 3.x) opens a new httpx client, and so a new TCP/TLS connection,
+    inside every invoke/ainvoke. This client posts to the same chat-completions route
+    through one pooled httpx.Client for invoke and one httpx.AsyncClient per event loop
+    for ainvoke, and returns replies with the same `content` and `metadata` fields.
+    The SDK's tracing and request logging are not applied to these calls.
+    """
+    
+    def __init__(self, model_id: str, api_key: str, base_url: str,
+                 max_connections: int = FLOTORCH_MAX_CONNECTIONS, timeout: float = FLOTORCH_TIMEOUT):
+        self.model_id = model_id
+        self.url = base_url.rstrip("/") + FLOTORCH_CHAT_ENDPOINT
+        self._headers = {"Authorization": f"Bearer {api_key}"}
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._timeout = timeout
+        self._client = httpx.Client(limits=self._limits, timeout=timeout, follow_redirects=True)
+        # An AsyncClient is bound to the loop it first ran on (asyncio.run creates a new one each time)
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+            weakref.WeakKeyDictionary()
+    
+    def _payload(self, messages: List[dict], kwargs: dict) -> dict:
+        return {"model": self.model_id, "messages": messages, **kwargs}
+    
+    @staticmethod
+    def _parse(response: httpx.Response) -> LLMReply:
+        response.raise_for_status()
+        body = response.json()
+        usage = body.get("usage") or {}
+        metadata = {
+            "inputTokens": str(usage.get("prompt_tokens", "N/A")),
+            "outputTokens": str(usage.get("completion_tokens", "N/A")),
+            "totalTokens": str(usage.get("total_tokens", "N/A")),
+            "raw_response": body,
+        }
+        return LLMReply(content=body["choices"][0]["message"].get("content") or "", metadata=metadata)
+    
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(limits=self._limits, timeout=self._timeout, follow_redirects=True)
+            self._async_clients[loop] = client
+        return client
+    
+    def invoke(self, messages: List[dict], **kwargs) -> LLMReply:
+        return self._parse(self._client.post(self.url, headers=self._headers, json=self._payload(messages, kwargs)))
+    
+    async def ainvoke(self, messages: List[dict], **kwargs) -> LLMReply:
+        response = await self._async_client().post(self.url, headers=self._headers, json=self._payload(messages, kwargs))
+        return self._parse(response)
+    
+    async def aclose(self):
+        """Close the pooled connections of the running loop (e.g. at server shutdown)."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+@functools.lru_cache(maxsize=None)
+def get_flotorch_client(base_url: str, model_name: str, api_key: str) -> PooledFlotorchLLM:
+    """Return the shared, connection-pooling client for a (model, base_url, api_key) combination."""
+    return PooledFlotorchLLM(model_id=model_name, api_key=api_key, base_url=base_url)
+
+
+def _parse_token_count(tokens_used: Any) -> int:
+    """Convert the gateway's token count (possibly 'N/A') to an int."""
+    try:
+        return int(tokens_used)
+    except (TypeError, ValueError):
+        return 0
+
+
 def call_flotorch_api(base_url: str, model_name: str, api_key: str, prompt: str) -> tuple:
     """Call Flotorch-monitored LLM API and return response with metadata."""
     messages = [{"role": "user", "content": prompt}]
-    model = FlotorchLLM(model_id=model_name, api_key=api_key, base_url=base_url)
+    model = get_flotorch_client(base_url, model_name, api_key)
     
     try:
         print(f"🔄 Calling Flotorch API...")
-        response = model.invoke(messages)
-        generated_text = response.content
-        
-        # Extract metadata for monitoring
-        tokens_used = response.metadata.get('totalTokens', 'N/A')
+        with profile_stage("llm", items=1) as stage:
+            response = model.invoke(messages)
+            generated_text = response.content
+            
+            # Extract metadata for monitoring
+            tokens_used = response.metadata.get('totalTokens', 'N/A')
+            stage.tokens = _parse_token_count(tokens_used)
         
         print(f"📊 Tokens used: {tokens_used}")
         print(f"✅ Response received successfully")
@@ -129,55 +1012,140 @@ def call_flotorch_api(base_url: str, model_name: str, api_key: str, prompt: str)
     except Exception as e:
         print(f"❌ API Error: {e}")
         return "", 0
-def generate_questions_from_pdf(sentences: List[str], base_url: str, model_name: str, api_key: str, num_questions: int = 4) -> tuple:
-    """Generate questions from random sentences in the PDF using Flotorch."""
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `rate` units per second up to `capacity`."""
     
-    # Select random sentences with sufficient length
-    selected_sentences = {}
-    attempts = 0
-    while len(selected_sentences) < num_questions and attempts < len(sentences) * 2:
-        idx = random.randint(0, len(sentences) - 1)
-        sentence = sentences[idx]
-        if len(sentence) > 50 and idx not in selected_sentences:
-            selected_sentences[idx] = sentence
-        attempts += 1
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._level = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
     
-    # Generate questions using Flotorch
-    question_prompt = """For the following sentence, create one specific question that can be answered using only the information in the sentence. 
-Make the question clear and focused.
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self, amount: float = 1.0):
+        """Wait until `amount` units are available and take them; waiters are served in order."""
+        amount = min(amount, self.capacity)  # a request larger than the bucket would never fit
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._level >= amount:
+                    self._level -= amount
+                    return
+                await asyncio.sleep((amount - self._level) / self.rate)
+    
+    def adjust(self, amount: float):
+        """Return (positive) or charge (negative) units after the fact, e.g. once real usage is known."""
+        self._refill()
+        self._level = min(self.capacity, self._level + amount)
 
-Sentence: {sentence}
 
-Generate only the question, without any additional text or explanation."""
+class RateLimiter:
+    """Combined requests/sec and tokens/min limit shared by all generation workers."""
     
-    query_texts = []
-    total_tokens = 0
+    def __init__(self, requests_per_second: float, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_second, max(1.0, requests_per_second))
+        # Allow bursts of up to ten seconds worth of tokens
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute / 6.0) if tokens_per_minute else None
     
-    print("🤖 Generating questions using Flotorch-monitored API calls...")
-    print("Selected sentences and generated questions:\n")
+    async def acquire(self, estimated_tokens: int):
+        await self.requests.acquire()
+        if self.tokens is not None:
+            await self.tokens.acquire(estimated_tokens)
     
-    for i, sentence in selected_sentences.items():
-        prompt = question_prompt.format(sentence=sentence)
-        question, tokens = call_flotorch_api(base_url, model_name, api_key, prompt)
-        
-        if question.strip():
-            query_texts.append(question.strip())
-            total_tokens += int(tokens) if tokens != 'N/A' else 0
-            
-            print(f"📝 Sentence {i}: {sentence}")
-            print(f"❓ Question {i}: {question.strip()}")
-            print(f"🔢 Tokens for this call: {tokens}")
-            print("-" * 70)
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket by the difference between the estimate and what the gateway reported."""
+        if self.tokens is not None and actual_tokens:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+
+
+@dataclass
+class GenerationUsage:
+    """Aggregate counters for a batch of concurrent LLM calls."""
+    requests: int = 0
+    failed: int = 0
+    total_tokens: int = 0
+    elapsed_seconds: float = 0.0
+
+
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+def _estimate_prompt_tokens(prompt: str, expected_completion_tokens: int) -> int:
+    """Rough pre-call token estimate (~4 characters per token) used for tokens/min limiting."""
+    return len(prompt) // 4 + expected_completion_tokens
+
+
+async def agenerate_completions(prompts: List[str], base_url: str, model_name: str, api_key: str,
+                                requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+                                tokens_per_minute: Optional[float] = None,
+                                max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                                expected_completion_tokens: int = 64) -> Tuple[List[tuple], GenerationUsage]:
+    """Run prompts concurrently under a rate limit, returning (text, tokens) per prompt in input order."""
+    model = get_flotorch_client(base_url, model_name, api_key)
+    limiter = RateLimiter(requests_per_second, tokens_per_minute)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    usage = GenerationUsage()
+    started = time.perf_counter()
+    
+    async def worker(prompt: str) -> tuple:
+        estimated_tokens = _estimate_prompt_tokens(prompt, expected_completion_tokens)
+        async with semaphore:
+            await limiter.acquire(estimated_tokens)
+            usage.requests += 1
+            try:
+                with profile_stage("llm", items=1) as stage:
+                    response = await model.ainvoke([{"role": "user", "content": prompt}])
+                    stage.tokens = _parse_token_count(response.metadata.get('totalTokens', 'N/A'))
+            except Exception as e:
+                usage.failed += 1
+                print(f"❌ API Error: {e}")
+                return "", 0
         
-        time.sleep(2)  # Rate limiting
+        tokens_used = response.metadata.get('totalTokens', 'N/A')
+        token_count = _parse_token_count(tokens_used)
+        limiter.record_usage(estimated_tokens, token_count)
+        usage.total_tokens += token_count
+        return response.content, tokens_used
     
-    print(f"\n📊 Total tokens used for question generation: {total_tokens}")
-    return query_texts, total_tokens
+    results = await asyncio.gather(*(worker(prompt) for prompt in prompts))
+    usage.elapsed_seconds = time.perf_counter() - started
+    return list(results), usage
 
-def generate_questions_from_pdf_rag(sentences: List[str], base_url: str, model_name: str, api_key: str, num_questions: int = 4) -> tuple:
-    """Generate questions from random sentences in the PDF using Flotorch."""
-    
-    # Select random sentences with sufficient length
+
+def run_async(coro):
+    """Run a coroutine to completion, also from inside an already running loop such as Jupyter's."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def generate_completions(prompts: List[str], base_url: str, model_name: str, api_key: str,
+                         **limits) -> Tuple[List[tuple], GenerationUsage]:
+    """Blocking wrapper around agenerate_completions for notebooks and scripts."""
+    return run_async(agenerate_completions(prompts, base_url, model_name, api_key, **limits))
+
+
+QUESTION_PROMPT = """For the following sentence, create one specific question that can be answered using only the information in the sentence. 
+Make the question clear and focused.
+
+Sentence: {sentence}
+
+Generate only the question, without any additional text or explanation."""
+
+
+def _select_question_sentences(sentences: List[str], num_questions: int) -> dict:
+    """Pick random sentences with sufficient length, keyed by sentence index."""
     selected_sentences = {}
     attempts = 0
     while len(selected_sentences) < num_questions and attempts < len(sentences) * 2:
@@ -186,42 +1154,59 @@ def generate_questions_from_pdf_rag(sentences: List[str], base_url: str, model_n
         if len(sentence) > 50 and idx not in selected_sentences:
             selected_sentences[idx] = sentence
         attempts += 1
-    
-    # Generate questions using Flotorch
-    question_prompt = """For the following sentence, create one specific question that can be answered using only the information in the sentence. 
-Make the question clear and focused.
+    return selected_sentences
 
-Sentence: {sentence}
 
-Generate only the question, without any additional text or explanation."""
+def generate_questions_from_pdf(sentences: List[str], base_url: str, model_name: str, api_key: str, num_questions: int = 4,
+                                requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+                                tokens_per_minute: Optional[float] = None,
+                                max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> tuple:
+    """Generate questions from random sentences in the PDF using Flotorch."""
     
-    query_texts = []
-    total_tokens = 0
+    selected_sentences = _select_question_sentences(sentences, num_questions)
+    prompts = [QUESTION_PROMPT.format(sentence=sentence) for sentence in selected_sentences.values()]
     
     print("🤖 Generating questions using Flotorch-monitored API calls...")
+    print(f"⚡ {len(prompts)} prompts, up to {max_concurrency} in flight at {requests_per_second} req/s")
     print("Selected sentences and generated questions:\n")
     
-    for i, sentence in selected_sentences.items():
-        prompt = question_prompt.format(sentence=sentence)
-        question, tokens = call_flotorch_api(base_url, model_name, api_key, prompt)
-        
+    results, usage = generate_completions(prompts, base_url, model_name, api_key,
+                                          requests_per_second=requests_per_second,
+                                          tokens_per_minute=tokens_per_minute,
+                                          max_concurrency=max_concurrency)
+    
+    query_texts = []
+    total_tokens = 0
+    
+    for (i, sentence), (question, tokens) in zip(selected_sentences.items(), results):
         if question.strip():
             query_texts.append(question.strip())
-            total_tokens += int(tokens) if tokens != 'N/A' else 0
+            total_tokens += _parse_token_count(tokens)
             
             print(f"📝 Sentence {i}: {sentence}")
             print(f"❓ Question {i}: {question.strip()}")
             print(f"🔢 Tokens for this call: {tokens}")
             print("-" * 70)
-        
-        time.sleep(2)  # Rate limiting
     
     print(f"\n📊 Total tokens used for question generation: {total_tokens}")
+    print(f"⏱️ {usage.requests} calls ({usage.failed} failed) in {usage.elapsed_seconds:.1f}s")
     return query_texts, total_tokens
 
+def generate_questions_from_pdf_rag(sentences: List[str], base_url: str, model_name: str, api_key: str, num_questions: int = 4,
+                                    **limits) -> tuple:
+    """Generate questions from random sentences in the PDF using Flotorch."""
+    return generate_questions_from_pdf(sentences, base_url, model_name, api_key, num_questions, **limits)
+
 def perform_monitored_rag_search(query_texts: List[str], sentences: List[str], index, embedder: SentenceTransformer, 
-                                base_url: str, model_name: str, api_key: str, k: int = 3):
-    """Perform RAG search and answer generation with Flotorch monitoring."""
+                                base_url: str, model_name: str, api_key: str, k: int = 3, answer_cache=None,
+                                context_token_budget: Optional[int] = None, pages: Optional[Sequence[int]] = None):
+    """Perform RAG search and answer generation with Flotorch monitoring.
+    
+    Pass a semantic_cache.SemanticAnswerCache as answer_cache to reuse answers to
+    rephrased questions over the same retrieved context instead of calling the gateway.
+    With context_token_budget set, retrieved sentences are deduplicated and packed
+    into that many tokens (see pack_context) before prompting.
+    """
     
     answer_prompt = """Consider the following context from the document: {context}
 
@@ -230,27 +1215,41 @@ Now answer the following question using only the context provided: {query}
 Provide a clear and concise answer based on the information given."""
     
     total_answer_tokens = 0
+    count_tokens = make_token_counter(embedder) if context_token_budget is not None else None
     
-    for query_idx, query_text in enumerate(query_texts, 1):
+    print(f"\n🔎 Searching FAISS index for {len(query_texts)} queries in one batch...")
+    results = batch_rag_retrieve(query_texts, sentences, index, embedder, k=k)
+    
+    for query_idx, result in enumerate(results, 1):
+        query_text = result.query
         print(f"\n🔍 QUERY {query_idx}: {query_text}")
         print("=" * 80)
         
-        # Embed the query text
-        query_embedding = embedder.encode(query_text, convert_to_numpy=True).reshape(1, -1)
-        
-        print(f"\n🔎 Searching FAISS index for similar content...")
-        distances, indices = index.search(query_embedding, k)
-        
-        context = ""
+        context = result.context
         print("\n📚 Retrieved Context:")
         print("-" * 50)
         
-        for i, idx in enumerate(indices[0]):
-            if idx < len(sentences):  # Safety check
-                retrieved_sentence = sentences[idx]
-                print(f"\n[{i+1}] {retrieved_sentence}")
-                print(f"    Similarity Score: {distances[0][i]:.4f}")
-                context += retrieved_sentence + "\n"
+        for i, (retrieved_sentence, score) in enumerate(zip(result.sentences, result.scores)):
+            print(f"\n[{i+1}] {retrieved_sentence}")
+            print(f"    Similarity Score: {score:.4f}")
+        
+        if context_token_budget is not None:
+            packed = pack_context(result, context_token_budget, count_tokens, pages=pages)
+            context = packed.context
+            print(f"\n📦 Packed context: {packed.tokens_used}/{context_token_budget} tokens, "
+                  f"{packed.tokens_saved} saved, {packed.duplicates_removed} duplicates removed")
+        
+        # The cache can reuse the retrieval query vector only if it embeds with the same model
+        query_embedding = result.embedding if getattr(answer_cache, "embedder", None) is embedder else None
+        cached = answer_cache.lookup(query_text, context, query_embedding) if answer_cache is not None else None
+        if cached is not None:
+            answer, tokens = cached
+            print("\n⚡ ANSWER (semantic cache hit, no gateway call):")
+            print("-" * 20)
+            print(answer)
+            print(f"\n🔢 Tokens saved: {tokens}")
+            print("\n" + "="*80 + "\n")
+            continue
         
         # Generate answer using Flotorch-monitored API
         print("\n🤖 Generating answer with Flotorch monitoring...")
@@ -258,6 +1257,8 @@ Provide a clear and concise answer based on the information given."""
         answer, tokens = call_flotorch_api(base_url, model_name, api_key, prompt)
         
         total_answer_tokens += int(tokens) if tokens != 'N/A' else 0
+        if answer_cache is not None and answer.strip():
+            answer_cache.store(query_text, context, answer, tokens, query_embedding)
         
         print("\n💡 ANSWER:")
         print("-" * 20)
@@ -267,6 +1268,11 @@ Provide a clear and concise answer based on the information given."""
         
         time.sleep(2)  # Rate limiting
     
+    if answer_cache is not None:
+        stats = answer_cache.stats()
+        print(f"📦 Semantic cache: {stats['hits']} hits / {stats['misses']} misses "
+              f"(hit rate {stats['hit_rate']:.0%}), {stats['tokens_saved']} tokens saved")
+    
     return total_answer_tokens
 
 
@@ -279,26 +1285,21 @@ Now answer the following question using only the context provided: {query}
 
 Provide a clear and concise answer based on the information given."""
     
-    for query_idx, query_text in enumerate(query_texts, 1):
+    print(f"\n Searching index for {len(query_texts)} queries in one batch...")
+    results = batch_rag_retrieve(query_texts, sentences, index, embedder, k=k)
+    
+    for query_idx, result in enumerate(results, 1):
+        query_text = result.query
         print(f"\n QUERY {query_idx}: {query_text}")
         print("=" * 80)
         
-        # Embed the query text
-        query_embedding = embedder.encode(query_text, convert_to_numpy=True).reshape(1, -1)
-        
-        print(f"\n Searching index for similar content...")
-        distances, indices = index.search(query_embedding, k)
-        
-        context = ""
+        context = result.context
         print("\n Retrieved Context:")
         print("-" * 50)
         
-        for i, idx in enumerate(indices[0]):
-            if idx < len(sentences):  # Safety check
-                retrieved_sentence = sentences[idx]
-                print(f"\n[{i+1}] {retrieved_sentence}")
-                print(f"    Similarity Score: {distances[0][i]:.4f}")
-                context += retrieved_sentence + "\n"
+        for i, (retrieved_sentence, score) in enumerate(zip(result.sentences, result.scores)):
+            print(f"\n[{i+1}] {retrieved_sentence}")
+            print(f"    Similarity Score: {score:.4f}")
         
         # Generate answer using Gemini
         print("\n Generating answer...")
@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+from pydantic import PositiveInt
 from pydantic_settings import BaseSettings
 
 
@@ -9,6 +11,34 @@ class Settings(BaseSettings):
     flotorch_api_key: str
     flotorch_model: str
     flotorch_base_url: str
+    # OpenAI-compatible gateway route used for streaming; None uses the FloTorch SDK's route
+    flotorch_openai_path: Optional[str] = None
+
+    # "http": graph nodes call the agent microservices
+    # "in_process": graph nodes call the agent functions inside the backend
+    execution_mode: Literal["http", "in_process"] = "http"
+
+    # Rule-based pre-screen: clear-cut applications skip the agents (off unless enabled)
+    # debt-to-income = (existing liabilities + loan amount) / income
+    prescreen_enabled: bool = False
+    prescreen_min_credit_score: int = 500
+    prescreen_max_debt_to_income: float = 6.0
+    prescreen_approve_min_credit_score: int = 780
+    prescreen_approve_max_debt_to_income: float = 0.5
+
+    # Shared HTTP client for the LangGraph -> agent hops
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_timeout: float = 30.0
+    http_pool_timeout: float = 10.0
+    http2: bool = False
+
+    # Concurrent LLM calls per agent service
+    agent_max_concurrent_llm_calls: PositiveInt = 32
+
+    # Loan evaluations in flight per /process/batch request
+    batch_max_concurrency: PositiveInt = 16
 
     class Config:
         env_file = ".env"
@@ -1,5 +1,5 @@
 from agents.credit_analyzer.model import CreditAnalyzerInput, CreditAnalyzerOutput
-from agents.credit_analyzer.utils import evaluate_credit
+from agents.credit_analyzer.utils import aevaluate_credit
 
 
 from fastapi import FastAPI
@@ -7,5 +7,5 @@ app = FastAPI()
 
 @app.post("/process", response_model=CreditAnalyzerOutput)
 async def process_credit(input_data: CreditAnalyzerInput):
-    return evaluate_credit(input_data)
+    return await aevaluate_credit(input_data)
 
@@ -1,11 +1,10 @@
 from agents.credit_analyzer.model import CreditAnalyzerInput, CreditAnalyzerOutput
 from agents.credit_analyzer.prompt import generate_prompt
 from common.flotorch_chat_model import chat_llm
+from common.llm_limits import llm_slots
 
 
-def evaluate_credit(input_data: CreditAnalyzerInput) -> CreditAnalyzerOutput:
-    prompt = generate_prompt(input_data.loan_summary, input_data.loan_data)
-    response = chat_llm.invoke(prompt)
+def _build_output(input_data: CreditAnalyzerInput, response) -> CreditAnalyzerOutput:
     credit_assessment = str(response.content).strip()
 
     # basic score bucketing through text parsing
@@ -24,3 +23,16 @@ def evaluate_credit(input_data: CreditAnalyzerInput) -> CreditAnalyzerOutput:
         credit_rating=credit_rating,
         loan_data=input_data.loan_data
     )
+
+
+def evaluate_credit(input_data: CreditAnalyzerInput) -> CreditAnalyzerOutput:
+    prompt = generate_prompt(input_data.loan_summary, input_data.loan_data)
+    response = chat_llm.invoke(prompt)
+    return _build_output(input_data, response)
+
+
+async def aevaluate_credit(input_data: CreditAnalyzerInput) -> CreditAnalyzerOutput:
+    prompt = generate_prompt(input_data.loan_summary, input_data.loan_data)
+    async with llm_slots():
+        response = await chat_llm.ainvoke(prompt)
+    return _build_output(input_data, response)
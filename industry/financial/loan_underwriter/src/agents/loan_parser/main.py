@@ -1,5 +1,5 @@
 from agents.loan_parser.model import LoanParserInput, LoanParserOutput
-from agents.loan_parser.utils import parse_application
+from agents.loan_parser.utils import aparse_application
 
 
 from fastapi import FastAPI
@@ -7,4 +7,4 @@ app = FastAPI()
 
 @app.post("/process", response_model=LoanParserOutput)
 async def process_application(input_data: LoanParserInput):
-    return parse_application(input_data)
+    return await aparse_application(input_data)
@@ -1,15 +1,28 @@
 from agents.loan_parser.model import LoanParserInput, LoanParserOutput
 from agents.loan_parser.prompt import generate_prompt
 from common.flotorch_chat_model import chat_llm
+from common.llm_limits import llm_slots
 
 
-def parse_application(input_data: LoanParserInput) -> LoanParserOutput:
-    loan_data = input_data.model_dump()
-    prompt = generate_prompt(loan_data)
-    response = chat_llm.invoke(prompt)
+def _build_output(loan_data: dict, response) -> LoanParserOutput:
     loan_summary = str(response.content).strip()
 
     return LoanParserOutput(
         loan_summary=loan_summary,
         loan_data=loan_data
     )
+
+
+def parse_application(input_data: LoanParserInput) -> LoanParserOutput:
+    loan_data = input_data.model_dump()
+    prompt = generate_prompt(loan_data)
+    response = chat_llm.invoke(prompt)
+    return _build_output(loan_data, response)
+
+
+async def aparse_application(input_data: LoanParserInput) -> LoanParserOutput:
+    loan_data = input_data.model_dump()
+    prompt = generate_prompt(loan_data)
+    async with llm_slots():
+        response = await chat_llm.ainvoke(prompt)
+    return _build_output(loan_data, response)
@@ -1,5 +1,5 @@
 from agents.risk_assessor.model import RiskAssessorInput, RiskAssessorOutput
-from agents.risk_assessor.utils import assess_risk
+from agents.risk_assessor.utils import aassess_risk
 
 
 from fastapi import FastAPI
@@ -7,4 +7,4 @@ app = FastAPI()
 
 @app.post("/process", response_model=RiskAssessorOutput)
 async def process_risk(input_data: RiskAssessorInput):
-    return assess_risk(input_data)
+    return await aassess_risk(input_data)
@@ -1,16 +1,18 @@
 from agents.risk_assessor.model import RiskAssessorInput, RiskAssessorOutput
 from agents.risk_assessor.prompt import generate_prompt
 from common.flotorch_chat_model import chat_llm
+from common.llm_limits import llm_slots
 
 
-def assess_risk(input_data: RiskAssessorInput) -> RiskAssessorOutput:
-    prompt = generate_prompt(
+def _build_prompt(input_data: RiskAssessorInput) -> list:
+    return generate_prompt(
         credit_assessment=input_data.credit_assessment,
         credit_rating=input_data.credit_rating,
         loan_data=input_data.loan_data
     )
-    
-    response = chat_llm.invoke(prompt)
+
+
+def _build_output(response) -> RiskAssessorOutput:
     risk_assessment = str(response.content).strip()
     risk_assessment_lower = risk_assessment.lower()
 
@@ -25,3 +27,15 @@ def assess_risk(input_data: RiskAssessorInput) -> RiskAssessorOutput:
         loan_decision=loan_decision,
         risk_assessment=risk_assessment
     )
+
+
+def assess_risk(input_data: RiskAssessorInput) -> RiskAssessorOutput:
+    response = chat_llm.invoke(_build_prompt(input_data))
+    return _build_output(response)
+
+
+async def aassess_risk(input_data: RiskAssessorInput) -> RiskAssessorOutput:
+    prompt = _build_prompt(input_data)
+    async with llm_slots():
+        response = await chat_llm.ainvoke(prompt)
+    return _build_output(response)
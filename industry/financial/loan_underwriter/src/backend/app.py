@@ -1,15 +1,28 @@
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Tuple, Union
+from pydantic import ValidationError
 from langgraph_flow.graph import build_graph
+from langgraph_flow.http_client import close_http_client, pool_metrics, start_http_client
 from common.loan_model import LoanRequest
 from langgraph_flow.graph import State
 from config import settings
 
 
-from fastapi import FastAPI
-app = FastAPI()
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 
-@app.on_event("startup")
-async def check_env():
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     print("✅ Environment variables loaded successfully")
+    await start_http_client()
+    yield
+    await close_http_client()
+
+app = FastAPI(lifespan=lifespan)
 
 graph = build_graph()
 
@@ -21,4 +34,133 @@ async def evaluate_loan(loan_request: LoanRequest):
         "output": loan_input
     }
     decision = await graph.ainvoke(state)
-    return decision
\ No newline at end of file
+    return decision
+
+
+def parse_batch(body: bytes, content_type: str) -> List[Union[LoanRequest, str]]:
+    """
+    Parse a JSON array or NDJSON body into LoanRequests.
+    Items that fail validation become error strings so one bad line does not reject the batch.
+    """
+    if "ndjson" in content_type or "jsonl" in content_type:
+        raw_items = [line for line in body.decode("utf-8").splitlines() if line.strip()]
+    else:
+        try:
+            raw_items = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+        if not isinstance(raw_items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of loan requests")
+
+    items = []
+    for raw in raw_items:
+        try:
+            if isinstance(raw, str):
+                items.append(LoanRequest.model_validate_json(raw))
+            else:
+                items.append(LoanRequest.model_validate(raw))
+        except ValidationError as e:
+            items.append(str(e))
+    return items
+
+
+async def run_batch(states: List[State], max_concurrency: int) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Run the graph over many states, yielding (index, decision or exception) as each finishes.
+    A fixed pool of workers keeps at most max_concurrency evaluations in flight.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    pending = iter(enumerate(states))
+
+    async def worker():
+        # Workers share one iterator, so every state is taken exactly once
+        for index, state in pending:
+            try:
+                result = await graph.ainvoke(state)
+            except Exception as e:
+                result = e
+            await queue.put((index, result))
+
+    # At least one worker, or the batch would never complete
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(max_concurrency, len(states))))]
+    try:
+        for _ in range(len(states)):
+            yield await queue.get()
+    finally:
+        # Client disconnected or batch done: stop any remaining work
+        for task in workers:
+            task.cancel()
+
+
+@app.post("/process/batch")
+async def evaluate_loan_batch(request: Request):
+    """
+    Evaluate a JSON array of LoanRequests, or NDJSON with one LoanRequest per line
+    (Content-Type: application/x-ndjson). Results stream back as NDJSON in completion order:
+    {"index": i, "status": "ok", "output": ...} or {"index": i, "status": "error", "error": ...}
+    """
+    items = parse_batch(await request.body(), request.headers.get("content-type", ""))
+
+    states = []
+    state_indexes = []
+    invalid = []
+    for index, item in enumerate(items):
+        if isinstance(item, LoanRequest):
+            states.append({"output": item.model_dump()["loan_details"]})
+            state_indexes.append(index)
+        else:
+            invalid.append({"index": index, "status": "error", "error": item})
+
+    async def results():
+        for line in invalid:
+            yield json.dumps(line) + "\n"
+        async for position, result in run_batch(states, settings.batch_max_concurrency):
+            index = state_indexes[position]
+            if isinstance(result, Exception):
+                line = {"index": index, "status": "error", "error": f"{type(result).__name__}: {result}"}
+            else:
+                line = {"index": index, "status": "ok", "output": result["output"]}
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/process/stream")
+async def evaluate_loan_stream(loan_request: LoanRequest):
+    """
+    Server-sent events as the graph runs: one "node" event per completed node with its
+    output and timing, then "done" with the final decision (or "error").
+    node_ms is the time since the previous node finished; nodes run one after another.
+    """
+    state: State = {"output": loan_request.model_dump()["loan_details"]}
+
+    async def events():
+        start = last = time.perf_counter()
+        output = None
+        try:
+            async for update in graph.astream(state, stream_mode="updates"):
+                now = time.perf_counter()
+                for node, values in update.items():
+                    values = values or {}
+                    output = values.get("output", output)
+                    yield sse_event("node", {
+                        "node": node,
+                        **values,
+                        "node_ms": (now - last) * 1000,
+                        "elapsed_ms": (now - start) * 1000,
+                    })
+                last = now
+        except Exception as e:
+            yield sse_event("error", {"error": f"{type(e).__name__}: {e}"})
+            return
+        yield sse_event("done", {"output": output, "elapsed_ms": (time.perf_counter() - start) * 1000})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/metrics")
+async def metrics():
+    return {"http_pool": pool_metrics()}
@@ -1,16 +1,57 @@
-from typing import Any, Dict, List, Optional, Union
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import BaseMessage, AIMessage
+from langchain_core.messages import BaseMessage, AIMessage, AIMessageChunk
 from langchain_core.messages.utils import convert_to_openai_messages
-from langchain_core.outputs import ChatResult, ChatGeneration
+from langchain_core.outputs import ChatResult, ChatGeneration, ChatGenerationChunk
+from openai import AsyncOpenAI, OpenAI
 from flotorch.sdk.llm import FlotorchLLM
 from config import settings
 
+try:
+    from flotorch.sdk.utils.llm_utils import LLM_ENDPOINT
+except ImportError:  # internal SDK module; this is the route it held in flotorch 3.x
+    LLM_ENDPOINT = "/openai/v1/chat/completions"
+
 
 FLOTORCH_API_KEY = settings.flotorch_api_key
 FLOTORCH_BASE_URL = settings.flotorch_base_url
 FLOTORCH_MODEL = settings.flotorch_model
 
+# OpenAI-compatible route of the FloTorch gateway, used for streaming; taken from the
+# SDK's own chat-completions endpoint unless overridden in settings
+FLOTORCH_OPENAI_PATH = settings.flotorch_openai_path or LLM_ENDPOINT[:-len("/chat/completions")]
+
+
+class StreamLatency:
+    """
+    Time-to-first-token and inter-token latency of one streamed completion.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+        self.gaps: List[float] = []
+
+    def token(self):
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        else:
+            self.gaps.append(now - self.last_token_at)
+        self.last_token_at = now
+
+    def summary(self) -> Dict[str, Any]:
+        ttft = self.first_token_at - self.start if self.first_token_at is not None else None
+        return {
+            "time_to_first_token_ms": ttft * 1000 if ttft is not None else None,
+            "inter_token_latency_ms": sum(self.gaps) / len(self.gaps) * 1000 if self.gaps else None,
+            "max_inter_token_latency_ms": max(self.gaps) * 1000 if self.gaps else None,
+            "chunks": len(self.gaps) + 1 if self.first_token_at is not None else 0,
+            "total_ms": (time.perf_counter() - self.start) * 1000,
+        }
+
 
 class ChatFloTorch(BaseChatModel):
     def __init__(
@@ -43,6 +84,15 @@ class ChatFloTorch(BaseChatModel):
 
         self._default_params = default_params or {}
 
+        # Streaming goes through the gateway's OpenAI-compatible endpoint; clients are created on first use
+        self._stream_config = {
+            "api_key": getattr(self._client, "api_key", api_key),
+            "base_url": getattr(self._client, "base_url", base_url).rstrip("/") + FLOTORCH_OPENAI_PATH,
+        }
+        self._model_id = getattr(self._client, "model_id", model_id)
+        self._openai: Optional[OpenAI] = None
+        self._async_openai: Optional[AsyncOpenAI] = None
+
     @property
     def _llm_type(self) -> str:
         return "flotorch"
@@ -122,5 +172,92 @@ class ChatFloTorch(BaseChatModel):
         result = self.convert_to_langchain(response)
         return result
 
+    def _stream_request(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs) -> Dict[str, Any]:
+        request, params = self._build_request(messages, stop, **kwargs)
+        return {
+            "model": self._model_id,
+            "messages": request,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            **params,
+        }
+
+    def convert_chunk(self, chunk: Any, latency: StreamLatency) -> Optional[ChatGenerationChunk]:
+        """
+        Convert one OpenAI-style stream chunk into a LangChain ChatGenerationChunk.
+        Returns None for chunks without content, finish reason or usage.
+        """
+        usage = None
+        if chunk.usage is not None:
+            usage = {
+                "input_tokens": chunk.usage.prompt_tokens,
+                "output_tokens": chunk.usage.completion_tokens,
+                "total_tokens": chunk.usage.total_tokens,
+            }
+
+        # Some gateways send the last delta and the usage in the same chunk
+        choice = chunk.choices[0] if chunk.choices else None
+        text = (choice.delta.content or "") if choice is not None and choice.delta is not None else ""
+        finish_reason = choice.finish_reason if choice is not None else None
+        if text:
+            latency.token()
+        elif finish_reason is None and usage is None:
+            return None
+
+        generation_info = {"finish_reason": finish_reason} if finish_reason else None
+        return ChatGenerationChunk(message=AIMessageChunk(content=text, usage_metadata=usage),
+                                   generation_info=generation_info)
+
+    def latency_chunk(self, latency: StreamLatency) -> ChatGenerationChunk:
+        """
+        Final empty chunk carrying the streaming latency in response_metadata["streaming"].
+        """
+        return ChatGenerationChunk(
+            message=AIMessageChunk(content="", response_metadata={"streaming": latency.summary()})
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs,
+    ) -> Iterator[ChatGenerationChunk]:
+        if self._openai is None:
+            self._openai = OpenAI(**self._stream_config)
+
+        latency = StreamLatency()
+        for chunk in self._openai.chat.completions.create(**self._stream_request(messages, stop, **kwargs)):
+            generation_chunk = self.convert_chunk(chunk, latency)
+            if generation_chunk is None:
+                continue
+            if run_manager and generation_chunk.text:
+                run_manager.on_llm_new_token(generation_chunk.text, chunk=generation_chunk)
+            yield generation_chunk
+
+        yield self.latency_chunk(latency)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self._async_openai is None:
+            self._async_openai = AsyncOpenAI(**self._stream_config)
+
+        latency = StreamLatency()
+        stream = await self._async_openai.chat.completions.create(**self._stream_request(messages, stop, **kwargs))
+        async for chunk in stream:
+            generation_chunk = self.convert_chunk(chunk, latency)
+            if generation_chunk is None:
+                continue
+            if run_manager and generation_chunk.text:
+                await run_manager.on_llm_new_token(generation_chunk.text, chunk=generation_chunk)
+            yield generation_chunk
+
+        yield self.latency_chunk(latency)
+
 
 chat_llm = ChatFloTorch()
\ No newline at end of file
@@ -0,0 +1,23 @@
+import asyncio
+from typing import Optional
+
+from config import settings
+
+
+# One budget for all agents in the process: each agent service in "http" mode,
+# or the backend when the agents run "in_process"
+_llm_slots: Optional[asyncio.Semaphore] = None
+_llm_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def llm_slots() -> asyncio.Semaphore:
+    """
+    Semaphore capping concurrent gateway calls, created inside the running event loop.
+    On Python 3.9 a semaphore binds to the loop current at creation, so it must not be made at import.
+    """
+    global _llm_slots, _llm_slots_loop
+    loop = asyncio.get_running_loop()
+    if _llm_slots is None or _llm_slots_loop is not loop:
+        _llm_slots = asyncio.Semaphore(settings.agent_max_concurrent_llm_calls)
+        _llm_slots_loop = loop
+    return _llm_slots
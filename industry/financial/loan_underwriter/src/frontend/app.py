@@ -1,3 +1,4 @@
+import json
 import streamlit as st
 import requests
 import pandas as pd
@@ -34,6 +35,42 @@ CSV_PATH = DATA_DIR / "loan_application_history.csv"
 
 # Locate backend
 BACKEND_URL = settings.backend_url
+STREAM_URL = f"{BACKEND_URL.rstrip('/')}/stream"
+
+# What each step reports as it completes
+NODE_LABELS = {
+    "Prescreen": ("🧮 Policy pre-screen", "verdict"),
+    "PrescreenDecision": ("📋 Pre-screen decision", "risk_assessment"),
+    "LoanParser": ("📝 Loan officer", "loan_summary"),
+    "CreditAnalyzer": ("💳 Credit analyst", "credit_assessment"),
+    "RiskAssessor": ("⚖️ Risk manager", "risk_assessment"),
+}
+
+
+def iter_sse(response):
+    """
+    Yield (event, data) pairs from a server-sent events response.
+    """
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+def render_step(event: dict):
+    label, field = NODE_LABELS.get(event["node"], (event["node"], None))
+    values = event.get("output") or event.get("prescreen") or {}
+    with st.expander(f"{label} · {event['node_ms'] / 1000:.1f}s", expanded=False):
+        if field and field in values:
+            st.write(values[field])
+        else:
+            st.json(values)
 
 # Persist application history
 try:
@@ -58,22 +95,32 @@ if submitted:
     
     loan_decision = "Undetermined"
 
-    # Send request to FastAPI backend
+    # Stream progress from the FastAPI backend, rendering each agent as it finishes
     try:
-        res = requests.post(BACKEND_URL, json=data)
-        if res.status_code == 200:
-            st.success("Response received!")
-            data = res.json()["output"]
-            loan_decision = data["loan_decision"]
-            risk_assessment = data["risk_assessment"]
-            if loan_decision == "Approved":
-                st.markdown("## ✅ Loan Approved")
+        with requests.post(STREAM_URL, json=data, stream=True) as res:
+            if res.status_code == 200:
+                with st.status("Evaluating application...", expanded=True) as status:
+                    output = None
+                    for event_type, event in iter_sse(res):
+                        if event_type == "node":
+                            render_step(event)
+                        elif event_type == "done":
+                            output = event["output"]
+                            status.update(label=f"Done in {event['elapsed_ms'] / 1000:.1f}s", state="complete", expanded=False)
+                        elif event_type == "error":
+                            status.update(label="Evaluation failed", state="error")
+                            st.error(event["error"])
+
+                if output:
+                    loan_decision = output["loan_decision"]
+                    risk_assessment = output["risk_assessment"]
+                    if loan_decision == "Approved":
+                        st.markdown("## ✅ Loan Approved")
+                    else:
+                        st.markdown("## ❌ Loan Denied")
+                    st.write(risk_assessment)
             else:
-                st.markdown("## ❌ Loan Denied")
-            st.write(risk_assessment)
-            # st.json(res.json())  # Pretty print JSON response
-        else:
-            st.error(f"Error {res.status_code}: {res.text}")
+                st.error(f"Error {res.status_code}: {res.text}")
     except Exception as e:
         st.error(f"Request failed: {e}")
         
@@ -1,8 +1,10 @@
 import os
-import httpx
 from typing import Any, TypedDict
+from typing_extensions import NotRequired
 from langchain_core.runnables import RunnableLambda
-from langgraph.graph import StateGraph
+from langgraph.graph import END, StateGraph
+from langgraph_flow.http_client import post_json
+from langgraph_flow.prescreen import REVIEW, render_decision, screen_applications
 from config import settings
 
 # Load MCP server URLs from .env
@@ -14,29 +16,81 @@ RISK_ASSESSOR_URL = settings.risk_assessor_url
 # State schema
 class State(TypedDict):
     output: Any
+    prescreen: NotRequired[dict]
 
 
 # MCP call wrapper
 def call_mcp_server(url):
     async def fn(state: State) -> State:
         print(f"[DEBUG] Calling {url} with payload:", state)
-        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as client:
-            response = await client.post(url, json=state["output"])
-            response.raise_for_status()
-            return {"output": response.json()}
+        # Shared keep-alive client: no new TCP/TLS handshake per hop
+        return {"output": await post_json(url, state["output"])}
 
     return RunnableLambda(fn).with_config({"run_name": f"CallMCP::{url.split(':')[2]}"})
 
 
+# In-process agent wrapper: same input validation as the agent's /process endpoint, no HTTP hop
+def call_agent(name, agent_fn, input_model):
+    async def fn(state: State) -> State:
+        output = await agent_fn(input_model.model_validate(state["output"]))
+        return {"output": output.model_dump()}
+
+    return RunnableLambda(fn).with_config({"run_name": f"Agent::{name}"})
+
+
+def build_nodes(execution_mode: str) -> dict:
+    if execution_mode == "http":
+        return {
+            "LoanParser": call_mcp_server(LOAN_PARSER_URL),
+            "CreditAnalyzer": call_mcp_server(CREDIT_ANALYZER_URL),
+            "RiskAssessor": call_mcp_server(RISK_ASSESSOR_URL),
+        }
+
+    # Imported here so HTTP deployments of the backend do not load the agents
+    from agents.loan_parser.model import LoanParserInput
+    from agents.loan_parser.utils import aparse_application
+    from agents.credit_analyzer.model import CreditAnalyzerInput
+    from agents.credit_analyzer.utils import aevaluate_credit
+    from agents.risk_assessor.model import RiskAssessorInput
+    from agents.risk_assessor.utils import aassess_risk
+
+    return {
+        "LoanParser": call_agent("LoanParser", aparse_application, LoanParserInput),
+        "CreditAnalyzer": call_agent("CreditAnalyzer", aevaluate_credit, CreditAnalyzerInput),
+        "RiskAssessor": call_agent("RiskAssessor", aassess_risk, RiskAssessorInput),
+    }
+
+
+# Rule-based pre-screen and its templated decision
+async def prescreen(state: State) -> State:
+    return {"prescreen": screen_applications([state["output"]])[0]}
+
+
+async def prescreen_decision(state: State) -> State:
+    return {"output": render_decision(state["output"], state["prescreen"])}
+
+
+def route_prescreen(state: State) -> str:
+    return "LoanParser" if state["prescreen"]["verdict"] == REVIEW else "PrescreenDecision"
+
+
 # Build LangGraph
-def build_graph():
+def build_graph(execution_mode: str = None):
+    execution_mode = execution_mode or settings.execution_mode
     graph = StateGraph(State)
 
-    graph.add_node("LoanParser", call_mcp_server(LOAN_PARSER_URL))
-    graph.add_node("CreditAnalyzer", call_mcp_server(CREDIT_ANALYZER_URL))
-    graph.add_node("RiskAssessor", call_mcp_server(RISK_ASSESSOR_URL))
+    for name, node in build_nodes(execution_mode).items():
+        graph.add_node(name, node)
+
+    if settings.prescreen_enabled:
+        graph.add_node("Prescreen", prescreen)
+        graph.add_node("PrescreenDecision", prescreen_decision)
+        graph.set_entry_point("Prescreen")
+        graph.add_conditional_edges("Prescreen", route_prescreen, ["LoanParser", "PrescreenDecision"])
+        graph.add_edge("PrescreenDecision", END)
+    else:
+        graph.set_entry_point("LoanParser")
 
-    graph.set_entry_point("LoanParser")
     graph.add_edge("LoanParser", "CreditAnalyzer")
     graph.add_edge("CreditAnalyzer", "RiskAssessor")
     graph.set_finish_point("RiskAssessor")
@@ -0,0 +1,99 @@
+import time
+from typing import Any, Optional
+
+import httpx
+from config import settings
+
+
+# One pooled client per backend process, opened and closed by the FastAPI lifespan
+_client: Optional[httpx.AsyncClient] = None
+
+_stats = {
+    "requests": 0,
+    "errors": 0,
+    "in_flight": 0,
+    "total_latency_ms": 0.0,
+}
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Build the shared keep-alive client from settings.
+    HTTP/2 needs the `h2` package (pip install "httpx[http2]").
+    """
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    timeout = httpx.Timeout(settings.http_timeout, pool=settings.http_pool_timeout)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=settings.http2)
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = create_http_client()
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Shared client; created on first use when the graph runs outside the backend app.
+    """
+    global _client
+    if _client is None:
+        _client = create_http_client()
+    return _client
+
+
+async def post_json(url: str, payload: Any) -> Any:
+    client = get_http_client()
+    _stats["requests"] += 1
+    _stats["in_flight"] += 1
+    start = time.perf_counter()
+    try:
+        response = await client.post(url, json=payload)
+        response.raise_for_status()
+        return response.json()
+    except Exception:
+        _stats["errors"] += 1
+        raise
+    finally:
+        _stats["in_flight"] -= 1
+        _stats["total_latency_ms"] += (time.perf_counter() - start) * 1000
+
+
+def pool_metrics() -> dict:
+    """
+    Request counters plus open/idle connection counts of the shared pool.
+    """
+    metrics = {
+        **_stats,
+        "mean_latency_ms": _stats["total_latency_ms"] / _stats["requests"] if _stats["requests"] else None,
+        "limits": {
+            "max_connections": settings.http_max_connections,
+            "max_keepalive_connections": settings.http_max_keepalive_connections,
+            "keepalive_expiry": settings.http_keepalive_expiry,
+            "http2": settings.http2,
+        },
+        "connections": None,
+    }
+
+    # httpcore's pool is not part of httpx's public API, so read it defensively
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is not None:
+        metrics["connections"] = {
+            "open": len(connections),
+            "idle": sum(1 for connection in connections if connection.is_idle()),
+            "http2": sum(1 for connection in connections if "HTTP/2" in repr(connection)),
+        }
+    return metrics
@@ -0,0 +1,79 @@
+import inspect
+from typing import List
+import numpy as np
+from config import settings
+
+
+APPROVE = "Approved"
+DENY = "Denied"
+REVIEW = "Review"
+
+
+def screen_applications(loans: List[dict]) -> List[dict]:
+    """
+    Apply the policy thresholds from settings to many applications at once.
+    debt_to_income is (existing_liabilities + loan_amount) / income.
+    Returns one {"verdict", "reasons", "credit_score", "debt_to_income"} per loan;
+    verdict is APPROVE or DENY for clear-cut cases and REVIEW for everything the agents should see.
+    """
+    credit_score = np.array([loan["credit_score"] for loan in loans], dtype=float)
+    income = np.array([loan["income"] for loan in loans], dtype=float)
+    debt = np.array([loan["existing_liabilities"] + loan["loan_amount"] for loan in loans], dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        debt_to_income = np.where(income > 0, debt / income, np.inf)
+
+    deny_rules = [
+        (credit_score < settings.prescreen_min_credit_score,
+         f"credit score below the minimum of {settings.prescreen_min_credit_score}"),
+        (income <= 0, "no reported income"),
+        (debt_to_income > settings.prescreen_max_debt_to_income,
+         f"debt-to-income above the maximum of {settings.prescreen_max_debt_to_income:g}"),
+    ]
+    approve = (
+        (credit_score >= settings.prescreen_approve_min_credit_score)
+        & (debt_to_income <= settings.prescreen_approve_max_debt_to_income)
+    )
+    deny = np.logical_or.reduce([mask for mask, _ in deny_rules])
+
+    results = []
+    for i in range(len(loans)):
+        if deny[i]:
+            verdict = DENY
+            reasons = [reason for mask, reason in deny_rules if mask[i]]
+        elif approve[i]:
+            verdict = APPROVE
+            reasons = [
+                f"credit score at or above {settings.prescreen_approve_min_credit_score}",
+                f"debt-to-income at or below {settings.prescreen_approve_max_debt_to_income:g}",
+            ]
+        else:
+            verdict = REVIEW
+            reasons = []
+        results.append({
+            "verdict": verdict,
+            "reasons": reasons,
+            "credit_score": int(credit_score[i]),
+            "debt_to_income": float(debt_to_income[i]) if np.isfinite(debt_to_income[i]) else None,
+        })
+    return results
+
+
+def render_decision(loan: dict, prescreen: dict) -> dict:
+    """
+    Templated decision in the same shape as the RiskAssessor output.
+    """
+    debt_to_income = prescreen["debt_to_income"]
+    reasons = "\n".join(f"- {reason}" for reason in prescreen["reasons"])
+    risk_assessment = inspect.cleandoc(f"""
+    Decision: {prescreen["verdict"]}
+    Decided by the policy pre-screen without agent review.
+    Applicant: {loan["name"]}
+    Credit score: {prescreen["credit_score"]}
+    Debt-to-income: {f"{debt_to_income:.2f}" if debt_to_income is not None else "N/A"}
+    Reasons:
+    """) + "\n" + reasons
+
+    return {
+        "loan_decision": prescreen["verdict"],
+        "risk_assessment": risk_assessment,
+    }
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+# config.Settings requires these; tests never call the services
+for name in ("BACKEND_URL", "LOAN_PARSER_URL", "CREDIT_ANALYZER_URL", "RISK_ASSESSOR_URL",
+             "FLOTORCH_API_KEY", "FLOTORCH_MODEL", "FLOTORCH_BASE_URL"):
+    os.environ.setdefault(name, "test")
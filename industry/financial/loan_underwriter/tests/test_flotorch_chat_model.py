@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+from common.flotorch_chat_model import StreamLatency, chat_llm
+
+
+def chunk(content=None, finish_reason=None, usage=None, choices=True):
+    choice = SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish_reason)
+    return SimpleNamespace(choices=[choice] if choices else [], usage=usage)
+
+
+USAGE = SimpleNamespace(prompt_tokens=5, completion_tokens=4, total_tokens=9)
+
+
+def test_content_chunk_records_a_token():
+    latency = StreamLatency()
+    generation = chat_llm.convert_chunk(chunk("Hi"), latency)
+    assert generation.message.content == "Hi"
+    assert latency.first_token_at is not None
+
+
+def test_empty_chunk_is_skipped():
+    assert chat_llm.convert_chunk(chunk(""), StreamLatency()) is None
+
+
+def test_usage_only_chunk():
+    generation = chat_llm.convert_chunk(chunk(usage=USAGE, choices=False), StreamLatency())
+    assert generation.message.content == ""
+    assert generation.message.usage_metadata["total_tokens"] == 9
+
+
+def test_usage_chunk_keeps_its_content_and_finish_reason():
+    generation = chat_llm.convert_chunk(chunk(" end", finish_reason="stop", usage=USAGE), StreamLatency())
+    assert generation.message.content == " end"
+    assert generation.message.usage_metadata["output_tokens"] == 4
+    assert generation.generation_info == {"finish_reason": "stop"}
@@ -0,0 +1,23 @@
+import asyncio
+
+from common.llm_limits import llm_slots
+
+
+def test_one_semaphore_per_running_loop():
+    async def twice():
+        return llm_slots(), llm_slots()
+
+    first, second = asyncio.run(twice())
+    assert first is second
+
+    third, _ = asyncio.run(twice())
+    assert third is not first
+
+
+def test_semaphore_usable_in_a_later_loop():
+    async def acquire():
+        async with llm_slots():
+            return True
+
+    assert asyncio.run(acquire())
+    assert asyncio.run(acquire())
@@ -0,0 +1,79 @@
+import pytest
+
+from config import settings
+from langgraph_flow.prescreen import APPROVE, DENY, REVIEW, render_decision, screen_applications
+
+
+@pytest.fixture(autouse=True)
+def thresholds(monkeypatch):
+    monkeypatch.setattr(settings, "prescreen_min_credit_score", 500)
+    monkeypatch.setattr(settings, "prescreen_max_debt_to_income", 6.0)
+    monkeypatch.setattr(settings, "prescreen_approve_min_credit_score", 780)
+    monkeypatch.setattr(settings, "prescreen_approve_max_debt_to_income", 0.5)
+
+
+def loan(credit_score=650, income=1000, existing_liabilities=0, loan_amount=1000):
+    return {
+        "name": "Test Applicant",
+        "credit_score": credit_score,
+        "income": income,
+        "existing_liabilities": existing_liabilities,
+        "loan_amount": loan_amount,
+    }
+
+
+def verdict(application):
+    return screen_applications([application])[0]["verdict"]
+
+
+def test_prescreen_disabled_by_default():
+    assert type(settings).model_fields["prescreen_enabled"].default is False
+
+
+@pytest.mark.parametrize("credit_score, expected", [(499, DENY), (500, REVIEW)])
+def test_min_credit_score_boundary(credit_score, expected):
+    assert verdict(loan(credit_score=credit_score)) == expected
+
+
+@pytest.mark.parametrize("loan_amount, expected", [(6000, REVIEW), (6001, DENY)])
+def test_max_debt_to_income_boundary(loan_amount, expected):
+    assert verdict(loan(loan_amount=loan_amount)) == expected
+
+
+def test_debt_to_income_includes_existing_liabilities():
+    assert verdict(loan(existing_liabilities=3000, loan_amount=3001)) == DENY
+
+
+@pytest.mark.parametrize("credit_score, expected", [(779, REVIEW), (780, APPROVE)])
+def test_approve_min_credit_score_boundary(credit_score, expected):
+    assert verdict(loan(credit_score=credit_score, loan_amount=500)) == expected
+
+
+@pytest.mark.parametrize("loan_amount, expected", [(500, APPROVE), (501, REVIEW)])
+def test_approve_max_debt_to_income_boundary(loan_amount, expected):
+    assert verdict(loan(credit_score=800, loan_amount=loan_amount)) == expected
+
+
+def test_no_income_is_denied():
+    result = screen_applications([loan(credit_score=800, income=0)])[0]
+    assert result["verdict"] == DENY
+    assert result["reasons"] == ["no reported income", "debt-to-income above the maximum of 6"]
+    assert result["debt_to_income"] is None
+
+
+def test_deny_takes_precedence_and_lists_every_reason():
+    result = screen_applications([loan(credit_score=400, loan_amount=7000)])[0]
+    assert result["verdict"] == DENY
+    assert len(result["reasons"]) == 2
+
+
+def test_batch_keeps_input_order():
+    loans = [loan(credit_score=400), loan(), loan(credit_score=800, loan_amount=100)]
+    assert [result["verdict"] for result in screen_applications(loans)] == [DENY, REVIEW, APPROVE]
+
+
+def test_render_decision_matches_risk_assessor_shape():
+    application = loan(credit_score=800, loan_amount=100)
+    decision = render_decision(application, screen_applications([application])[0])
+    assert decision["loan_decision"] == APPROVE
+    assert "Debt-to-income: 0.10" in decision["risk_assessment"]